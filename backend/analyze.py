@@ -10,6 +10,7 @@ Usage:
 """
 
 import argparse
+import asyncio
 import json
 import sys
 from pathlib import Path
@@ -182,7 +183,7 @@ def analyze_incident(
     
     try:
         # Run analysis
-        result = graph.invoke(initial_state)
+        result = asyncio.run(graph.ainvoke(initial_state))
         logger.info(f"Analysis complete. Decision: {result.get('decision')}")
         return result
     
@@ -36,11 +36,12 @@ from core.agents.timeline_correlator import build_timeline
 from core.agents.hypothesis_generator import generate_hypotheses
 from core.agents.verifier import EvidenceVerifier
 from core.agents.decision_gate import make_decision
-from core.graph import build_incident_analysis_graph
+from core.graph import END, build_incident_analysis_graph, stream_analysis
 import config
 
 # Database imports
 from core.database.session import get_db, init_db
+from core.database.audit import start_audit_writer, stop_audit_writer
 from core.database.crud import (
     create_analysis,
     get_analysis_by_id,
@@ -51,7 +52,7 @@ from core.database.settings import (
     get_user_settings_for_api,
     update_user_settings_from_api,
 )
-from core.auth import get_current_user, get_optional_user
+from core.auth import get_current_user, get_optional_user, shutdown_password_pool
 from core.database.models import User
 from core.database.crud import create_audit_log
 
@@ -149,6 +150,9 @@ async def lifespan(app: FastAPI):
         print(f"   ⚠️  Database initialization failed: {e}")
         print("   Continuing with file-based storage (backward compatibility)")
     
+    # Audit logs are written in batches in the background
+    start_audit_writer()
+    
     if MCP_AVAILABLE:
         client = get_mcp_client()
         print(f"   MCP servers: {client.get_available_servers()}")
@@ -157,6 +161,8 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     print("🛑 Shutting down Incident Analysis API...")
+    await stop_audit_writer()
+    shutdown_password_pool()
 
 
 # Create FastAPI app
@@ -330,13 +336,26 @@ async def analyze_incident(
         print(f"🚀 Starting LangGraph analysis with query: {request.query}")
         
         # Import and build the graph
-        from core.graph import build_incident_analysis_graph
-        
-        graph = build_incident_analysis_graph()
+        from core.graph import (
+            GRAPH_FAST_PATH, build_incident_analysis_graph, get_checkpointer,
+            run_analysis, run_fast_path
+        )
         
-        # Run the graph
-        print("🔗 Executing LangGraph workflow...")
-        final_state = graph.invoke(initial_state)
+        # Without a timestamp from the client the input isn't stable (it gets
+        # "now"), so a retry could never resume it; don't checkpoint it
+        checkpointer = get_checkpointer() if request.timestamp else None
+        if GRAPH_FAST_PATH and checkpointer is None:
+            print("🔗 Executing analysis (fast path)...")
+            final_state = await run_fast_path(initial_state)
+        else:
+            graph = build_incident_analysis_graph(checkpointer=checkpointer)
+            
+            # Run the graph (resuming this user's interrupted run of the same input, if any)
+            print("🔗 Executing LangGraph workflow...")
+            final_state = await run_analysis(
+                graph, initial_state,
+                user_id=current_user.id if current_user else None
+            )
         
         # Extract results from final state
         plan = final_state.get("plan", {})
@@ -523,19 +542,11 @@ async def analyze_incident_stream(
             start_time = datetime.now()
             yield f"data: {json.dumps({'status': 'started', 'analysis_id': analysis_id})}\n\n"
 
-            # 2. STREAM AND ACCUMULATE
-            async for chunk in graph.astream(accumulated_state, stream_mode="updates"):
-                node_name = list(chunk.keys())[0]
-                node_data = chunk[node_name]
-                
-                # --- CRITICAL FIX: The Update Logic ---
-                for key, value in node_data.items():
-                    if isinstance(value, list) and key in accumulated_state:
-                        # Append to lists (evidence, history, etc.) instead of overwriting
-                        accumulated_state[key].extend(value)
-                    else:
-                        # Update single values (decision, plan, etc.)
-                        accumulated_state[key] = value
+            # 2. STREAM NODE UPDATES; the graph hands back the final state at the end
+            async for node_name, node_data in stream_analysis(graph, accumulated_state):
+                if node_name == END:
+                    accumulated_state = node_data
+                    continue
                 
                 # Send progress with partial data string
                 yield f"data: {json.dumps({'status': 'progress', 'node': node_name, 'data': str(node_data)[:200]})}\n\n"
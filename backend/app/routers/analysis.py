@@ -124,7 +124,7 @@ async def analyze_incident(
         
         if hypotheses:
             logger.info(f"Verifying {len(hypotheses)} hypotheses...")
-            verifier = EvidenceVerifier()
+            verifier = EvidenceVerifier(cache_results=True)
             
             # Group evidence by source type
             evidence_by_source = {"image": [], "log": [], "historical": [], "runbook": []}
@@ -133,7 +133,7 @@ async def analyze_incident(
                 evidence_by_source[source_type].append(ev)
             
             # Verify hypotheses
-            verified_dict, overall_confidence = verifier.verify_hypotheses(
+            verified_dict, overall_confidence = await verifier.verify_hypotheses_async(
                 hypotheses=hypotheses,
                 evidence=evidence_by_source,
                 timeline=timeline
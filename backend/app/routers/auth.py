@@ -8,8 +8,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
 from core.auth import (
-    verify_password,
-    get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
     get_current_user,
     ACCESS_TOKEN_EXPIRE_MINUTES,
@@ -93,17 +93,9 @@ async def signup(
             detail="Password must be at least 8 characters"
         )
     
-    # Check password byte length (bcrypt limit is 72 bytes)
-    password_bytes = request.password.encode('utf-8')
-    if len(password_bytes) > 72:
-        # Password will be automatically truncated to 72 bytes
-        # This is handled in get_password_hash()
-        # We accept it but the user should be aware
-        pass
-    
     # Create user
     try:
-        password_hash = get_password_hash(request.password)
+        password_hash = await get_password_hash_async(request.password)
     except Exception as e:
         # Handle password hashing errors (e.g., bcrypt 72-byte limit)
         error_msg = str(e)
@@ -166,7 +158,7 @@ async def login(
         )
     
     # Verify password
-    if not verify_password(request.password, user.password_hash):
+    if not await verify_password_async(request.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -2,6 +2,7 @@
 Analysis history endpoints.
 """
 
+from datetime import datetime
 from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
@@ -39,6 +40,9 @@ class AnalysisListResponse(BaseModel):
     total: int
     limit: int
     offset: int
+    # Cursor for the next page (pass back as before/before_id), if there is one
+    next_before: Optional[str] = None
+    next_before_id: Optional[str] = None
 
 
 @router.get("", response_model=AnalysisListResponse)
@@ -46,20 +50,27 @@ async def list_analyses(
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
     status: Optional[str] = Query(None),
+    before: Optional[datetime] = Query(None, description="Only analyses created before this time (next_before of the previous page)"),
+    before_id: Optional[str] = Query(None, description="Tie-breaker for before (next_before_id of the previous page)"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
     List analyses for the current user.
-    Supports pagination and status filtering.
+    Supports pagination (offset, or the cheaper before cursor) and status filtering.
     """
+    # One extra row tells whether there is a next page
     analyses = await get_user_analyses(
         db=db,
         user_id=current_user.id,
-        limit=limit,
+        limit=limit + 1,
         offset=offset,
-        status=status
+        status=status,
+        before=before,
+        before_id=before_id
     )
+    has_more = len(analyses) > limit
+    analyses = analyses[:limit]
     
     summaries = [
         AnalysisSummary(
@@ -78,7 +89,9 @@ async def list_analyses(
         analyses=summaries,
         total=len(summaries),
         limit=limit,
-        offset=offset
+        offset=offset,
+        next_before=summaries[-1].created_at if has_more else None,
+        next_before_id=summaries[-1].id if has_more else None
     )
 
 
@@ -6,16 +6,30 @@ Queries Grafana API to retrieve dashboards and annotations for incident investig
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import config
-from ..graph import Evidence
+from agents.verifier import Evidence
+
+# One pooled session shared by every GrafanaAgent, so dashboard, panel and
+# annotation calls reuse keep-alive connections across analyses
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
 
 
 class GrafanaAgent:
     """Agent for querying Grafana dashboards and data."""
     
-    def __init__(self, grafana_url: str = None, api_key: str = None):
+    def __init__(
+        self,
+        grafana_url: str = None,
+        api_key: str = None,
+        session: Optional[requests.Session] = None
+    ):
         self.base_url = grafana_url or config.GRAFANA_URL
+        self.session = session or _session
         self.api_key = api_key or config.GRAFANA_API_KEY
         self.headers = {
             "Authorization": f"Bearer {api_key}" if api_key else "",
@@ -40,7 +54,7 @@ class GrafanaAgent:
             if tags:
                 params["tags"] = ",".join(tags)
             
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/api/search",
                 headers=self.headers,
                 params=params,
@@ -62,7 +76,7 @@ class GrafanaAgent:
             Dashboard JSON with panels and metadata
         """
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/api/dashboards/uid/{dashboard_id}",
                 headers=self.headers,
                 timeout=10
@@ -98,7 +112,7 @@ class GrafanaAgent:
             if tags:
                 params["tags"] = tags
             
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/api/annotations",
                 headers=self.headers,
                 params=params,
@@ -13,10 +13,14 @@ Usage:
     )
 """
 
+import copy
 import json
 import re
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 import sys
 from pathlib import Path
 from typing import List
@@ -38,6 +42,20 @@ except ImportError:
 import config
 from prompts.planner import PLANNER_PROMPT
 
+# LLM-derived plans by (query, timestamp), so a repeated question skips the
+# LLM call. Only a plan the LLM returned as valid JSON is cached; heuristics
+# run every time. The TTL lets prompt/model changes take effect.
+PLAN_CACHE_TTL_SECONDS = 600
+PLAN_CACHE_MAX_ENTRIES = 256
+_plan_cache: "OrderedDict[tuple, Tuple[float, Dict]]" = OrderedDict()
+_plan_cache_lock = threading.Lock()
+
+
+def clear_plan_cache() -> None:
+    """Drop all cached plans."""
+    with _plan_cache_lock:
+        _plan_cache.clear()
+
 
 class PlannerAgent:
     """
@@ -84,11 +102,44 @@ class PlannerAgent:
             - required_agents: Which agents to invoke
             - search_windows: Time ranges for searching
         """
-        # Use LLM to parse the query
-        llm_plan = self._call_llm(query, timestamp)
-        
-        # Extract and validate the plan
-        plan = self._extract_plan(llm_plan)
+        cache_key = (" ".join(query.split()), timestamp)
+        cached = None
+        with _plan_cache_lock:
+            entry = _plan_cache.get(cache_key)
+            if entry is not None:
+                stored_at, cached = entry
+                if time.monotonic() - stored_at >= PLAN_CACHE_TTL_SECONDS:
+                    del _plan_cache[cache_key]
+                    cached = None
+                else:
+                    _plan_cache.move_to_end(cache_key)
+        
+        if cached is not None:
+            plan = copy.deepcopy(cached)
+        else:
+            # Use LLM to parse the query
+            try:
+                llm_plan = self._call_llm(query, timestamp)
+                from_llm = True
+            except Exception as e:
+                print(f"⚠️  LLM call failed: {e}. Using fallback parsing.")
+                llm_plan = self._fallback_parse(query, timestamp)
+                from_llm = False
+            
+            # Extract and validate the plan
+            plan = self._parse_plan_json(llm_plan)
+            parsed = plan is not None
+            if not parsed:
+                plan = self._manual_extract(llm_plan)
+            
+            # Fallback and manually extracted plans aren't cached, so the LLM
+            # is retried next time
+            if from_llm and parsed:
+                with _plan_cache_lock:
+                    _plan_cache[cache_key] = (time.monotonic(), copy.deepcopy(plan))
+                    _plan_cache.move_to_end(cache_key)
+                    if len(_plan_cache) > PLAN_CACHE_MAX_ENTRIES:
+                        _plan_cache.popitem(last=False)
         
         # Enhance with heuristics
         plan = self._enhance_plan(plan, query, timestamp)
@@ -96,7 +147,7 @@ class PlannerAgent:
         return plan
     
     def _call_llm(self, query: str, timestamp: Optional[str]) -> str:
-        """Call LLM to generate initial plan"""
+        """Call LLM to generate initial plan (raises if the call fails)"""
         
         prompt = f"""{PLANNER_PROMPT}
 
@@ -105,35 +156,30 @@ Timestamp: {timestamp or 'Not provided'}
 
 Generate the execution plan in JSON format:"""
         
-        try:
-            if self.llm_type == "anthropic":
-                response = self.llm_client.messages.create(
-                    model=config.PRIMARY_LLM,
-                    max_tokens=1000,
-                    messages=[{
-                        "role": "user",
-                        "content": prompt
-                    }]
-                )
-                return response.content[0].text
-            
-            else:  # OpenAI
-                response = self.llm_client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[{
-                        "role": "user",
-                        "content": prompt
-                    }],
-                    max_tokens=1000
-                )
-                return response.choices[0].message.content
-        
-        except Exception as e:
-            print(f"⚠️  LLM call failed: {e}. Using fallback parsing.")
-            return self._fallback_parse(query, timestamp)
+        if self.llm_type == "anthropic":
+            response = self.llm_client.messages.create(
+                model=config.PRIMARY_LLM,
+                max_tokens=1000,
+                messages=[{
+                    "role": "user",
+                    "content": prompt
+                }]
+            )
+            return response.content[0].text
+        
+        else:  # OpenAI
+            response = self.llm_client.chat.completions.create(
+                model="gpt-4o",
+                messages=[{
+                    "role": "user",
+                    "content": prompt
+                }],
+                max_tokens=1000
+            )
+            return response.choices[0].message.content
     
-    def _extract_plan(self, llm_response: str) -> Dict:
-        """Extract JSON plan from LLM response"""
+    def _parse_plan_json(self, llm_response: str) -> Optional[Dict]:
+        """JSON plan from an LLM response, or None if it doesn't parse"""
         try:
             # Remove markdown code blocks if present
             cleaned = llm_response.strip()
@@ -142,15 +188,13 @@ Generate the execution plan in JSON format:"""
             elif "```" in cleaned:
                 cleaned = cleaned.split("```")[1].split("```")[0]
             
-            plan = json.loads(cleaned.strip())
-            return plan
+            return json.loads(cleaned.strip())
         
         except json.JSONDecodeError as e:
             print(f"⚠️  Failed to parse LLM response as JSON: {e}")
             print(f"Response: {llm_response[:200]}...")
-            
-            # Try to extract structured data manually
-            return self._manual_extract(llm_response)
+            return None
+
     
     def _manual_extract(self, text: str) -> Dict:
         """Manually extract plan elements from text"""
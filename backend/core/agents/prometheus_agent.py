@@ -1,88 +1,346 @@
 from prometheus_api_client import PrometheusConnect
+from requests import Session
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta
 from core.agents.verifier import Evidence
+from core.jsonutil import json_dumps, json_loads
 import json
-from typing import List, Optional, Dict, Any
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Range-query responses keyed by (url, query, start, end, step). Incident
+# windows are usually in the past, so identical re-analysis queries can be
+# answered locally; the TTL bounds staleness for windows that include "now".
+QUERY_CACHE_TTL_SECONDS = 60
+QUERY_CACHE_MAX_ENTRIES = 512
+_query_cache: "OrderedDict[Tuple, Tuple[float, List[Dict]]]" = OrderedDict()
+_query_cache_lock = threading.Lock()
+
+
+def _cache_get(key: Tuple) -> Optional[List[Dict]]:
+    """Return a cached range-query result if present and not expired."""
+    with _query_cache_lock:
+        entry = _query_cache.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if time.monotonic() - stored_at >= QUERY_CACHE_TTL_SECONDS:
+            del _query_cache[key]
+            return None
+        _query_cache.move_to_end(key)
+        return result
+
+
+def _cache_put(key: Tuple, result: List[Dict]) -> None:
+    """Store a range-query result, evicting the least recently used entry."""
+    with _query_cache_lock:
+        _query_cache[key] = (time.monotonic(), result)
+        _query_cache.move_to_end(key)
+        while len(_query_cache) > QUERY_CACHE_MAX_ENTRIES:
+            _query_cache.popitem(last=False)
+
+
+def clear_query_cache() -> None:
+    """Drop all cached range-query results."""
+    with _query_cache_lock:
+        _query_cache.clear()
+
+
+def compute_quantiles(
+    series: List[Dict],
+    qs: Iterable[float] = (0.5, 0.95, 0.99)
+) -> Dict[float, List[List[float]]]:
+    """
+    Compute several quantiles from one set of cumulative histogram buckets.
+    
+    Follows PromQL's histogram_quantile() (linear interpolation inside the
+    matching bucket), but answers every quantile in a single pass over each
+    timestamp's sorted buckets instead of one query per quantile.
+    
+    Args:
+        series: Range query result where each series carries an "le" label
+        qs: Quantiles to compute (0-1)
+    
+    Returns:
+        Dict mapping each quantile to a list of [timestamp, value] pairs
+    """
+    # Group bucket counts by timestamp
+    buckets_by_ts: Dict[float, List[Tuple[float, float]]] = {}
+    for s in series:
+        le = s.get("metric", {}).get("le")
+        if le is None:
+            continue
+        try:
+            upper = float(le)
+        except ValueError:
+            continue
+        
+        for timestamp, count in s.get("values", []):
+            try:
+                count = float(count)
+            except (TypeError, ValueError):
+                continue
+            if math.isnan(count):
+                continue
+            buckets_by_ts.setdefault(timestamp, []).append((upper, count))
+    
+    sorted_qs = sorted(qs)
+    result: Dict[float, List[List[float]]] = {q: [] for q in sorted_qs}
+    
+    for timestamp in sorted(buckets_by_ts):
+        buckets = sorted(buckets_by_ts[timestamp])
+        
+        # Need at least one finite bucket plus the +Inf bucket holding the total
+        if len(buckets) < 2 or buckets[-1][0] != math.inf:
+            continue
+        total = buckets[-1][1]
+        if total <= 0:
+            continue
+        
+        # Quantiles are sorted, so the bucket index only ever moves forward
+        idx = 0
+        for q in sorted_qs:
+            rank = q * total
+            while idx < len(buckets) - 1 and buckets[idx][1] < rank:
+                idx += 1
+            
+            upper, count = buckets[idx]
+            if upper == math.inf:
+                # Quantile falls in the +Inf bucket: report the highest finite bound
+                value = buckets[-2][0]
+            else:
+                lower, prev_count = buckets[idx - 1] if idx > 0 else (0.0, 0.0)
+                in_bucket = count - prev_count
+                if in_bucket <= 0:
+                    value = upper
+                else:
+                    value = lower + (upper - lower) * (rank - prev_count) / in_bucket
+            
+            result[q].append([timestamp, value])
+    
+    return result
+
 
 class PrometheusAgent:
-    def __init__(self, url: str = "http://localhost:9090", debug=False):
-        self.client = PrometheusConnect(url=url, disable_ssl=True)
+    # How long auto-discovered jobs are reused before asking Prometheus again
+    JOBS_CACHE_TTL_SECONDS = 60
+    
+    # Label used to tag each sub-expression of a batched query
+    SERIES_LABEL = "__series__"
+    
+    # Range queries use the coarser of 1m and whatever keeps a window at
+    # this many samples per series
+    MAX_RANGE_SAMPLES = 120
+
+    def __init__(
+        self,
+        url: str = "http://localhost:9090",
+        debug=False,
+        batch_queries: bool = True
+    ):
+        self.url = url.rstrip("/")
         self.debug = debug
+        self.batch_queries = batch_queries
+        
+        # One pooled session for every query so bursts of range queries reuse
+        # keep-alive connections instead of reconnecting per request
+        self._session = Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.verify = False
         
-        # Updated metrics based on actual incident-rag metrics
+        self.client = PrometheusConnect(url=self.url, disable_ssl=True, session=self._session)
+        
+        # (monotonic timestamp, jobs) from the last successful discovery
+        self._jobs_cache = (0.0, None)
+        
+        # Updated metrics based on actual incident-rag metrics. Each %s is a
+        # job label matcher (see _job_matcher); aggregations keep the job
+        # label so one query can cover several jobs.
         self.metrics = {
-            # HTTP Metrics - try rate first, fall back to raw counter
-            "http_requests_rate": 'rate(http_requests_total{job="%s"}[5m])',
-            "http_requests_2xx": 'rate(http_requests_total{job="%s",status="2xx"}[5m])',
-            "http_requests_4xx": 'rate(http_requests_total{job="%s",status="4xx"}[5m])',
-            "http_requests_5xx": 'rate(http_requests_total{job="%s",status="5xx"}[5m])',
-            "http_requests_total_raw": 'http_requests_total{job="%s"}',
+            # HTTP Metrics - one rate per status class; split locally into
+            # http_requests_2xx/4xx/5xx plus the overall http_requests_rate
+            "http_requests_by_status": 'sum by (job, status) (rate(http_requests_total{%s}[5m]))',
+            "http_requests_total_raw": 'http_requests_total{%s}',
             
-            # Latency Metrics (using the highr histogram)
-            "latency_p99": 'histogram_quantile(0.99, rate(http_request_duration_highr_seconds_bucket{job="%s"}[5m]))',
-            "latency_p95": 'histogram_quantile(0.95, rate(http_request_duration_highr_seconds_bucket{job="%s"}[5m]))',
-            "latency_p50": 'histogram_quantile(0.50, rate(http_request_duration_highr_seconds_bucket{job="%s"}[5m]))',
-            "latency_avg": 'rate(http_request_duration_highr_seconds_sum{job="%s"}[5m]) / rate(http_request_duration_highr_seconds_count{job="%s"}[5m])',
+            # Latency Metrics (using the highr histogram). The buckets are fetched
+            # once and every quantile in self.latency_quantiles is computed locally.
+            "latency_buckets": 'sum by (job, le) (rate(http_request_duration_highr_seconds_bucket{%s}[5m]))',
+            "latency_avg": 'rate(http_request_duration_highr_seconds_sum{%s}[5m]) / rate(http_request_duration_highr_seconds_count{%s}[5m])',
             
             # Resource Metrics - these are gauges, no rate() needed
-            "cpu_usage_rate": 'rate(process_cpu_seconds_total{job="%s"}[5m]) * 100',
-            "cpu_seconds_total": 'process_cpu_seconds_total{job="%s"}',
-            "memory_usage_mb": 'process_resident_memory_bytes{job="%s"} / 1024 / 1024',
-            "memory_virtual_mb": 'process_virtual_memory_bytes{job="%s"} / 1024 / 1024',
-            "open_file_descriptors": 'process_open_fds{job="%s"}',
+            "cpu_usage_rate": 'rate(process_cpu_seconds_total{%s}[5m]) * 100',
+            "cpu_seconds_total": 'process_cpu_seconds_total{%s}',
+            "memory_usage_mb": 'process_resident_memory_bytes{%s} / 1024 / 1024',
+            "memory_virtual_mb": 'process_virtual_memory_bytes{%s} / 1024 / 1024',
+            "open_file_descriptors": 'process_open_fds{%s}',
             
             # Response Size
-            "response_size_rate": 'rate(http_response_size_bytes_sum{job="%s"}[5m])',
-            "response_size_avg": 'rate(http_response_size_bytes_sum{job="%s"}[5m]) / rate(http_response_size_bytes_count{job="%s"}[5m])',
-            "response_size_bytes_total": 'http_response_size_bytes_sum{job="%s"}',
+            "response_size_rate": 'rate(http_response_size_bytes_sum{%s}[5m])',
+            "response_size_avg": 'rate(http_response_size_bytes_sum{%s}[5m]) / rate(http_response_size_bytes_count{%s}[5m])',
+            "response_size_bytes_total": 'http_response_size_bytes_sum{%s}',
             
             # Python GC Metrics
-            "gc_collections_rate": 'rate(python_gc_collections_total{job="%s"}[5m])',
-            "gc_collections_total": 'python_gc_collections_total{job="%s"}',
-            "gc_objects_collected_rate": 'rate(python_gc_objects_collected_total{job="%s"}[5m])',
+            "gc_collections_rate": 'rate(python_gc_collections_total{%s}[5m])',
+            "gc_collections_total": 'python_gc_collections_total{%s}',
+            "gc_objects_collected_rate": 'rate(python_gc_objects_collected_total{%s}[5m])',
+        }
+        
+        # Synthetic metrics derived from "latency_buckets"
+        self.latency_quantiles = {
+            "latency_p99": 0.99,
+            "latency_p95": 0.95,
+            "latency_p50": 0.50,
         }
 
     def range_query(self, query: str, start: datetime, end: datetime, step: str = "1m") -> List[Dict]:
         """Execute a Prometheus range query with error handling."""
         if self.debug:
-            print(f"[PROMETHEUS] QUERY: {query}")
-            print(f"[PROMETHEUS] TIME RANGE: {start} to {end}")
+            logger.debug("[PROMETHEUS] QUERY: %s", query)
+            logger.debug("[PROMETHEUS] TIME RANGE: %s to %s", start, end)
         
         try:
-            result = self.client.custom_query_range(
-                query=query, 
-                start_time=start, 
-                end_time=end, 
-                step=step
-            )
+            result = self._fetch_range(query, start, end, step)
             
             if self.debug and result:
-                print(f"[PROMETHEUS] SUCCESS: Retrieved {len(result)} metric series")
+                logger.debug("[PROMETHEUS] SUCCESS: Retrieved %d metric series", len(result))
             elif self.debug:
-                print(f"[PROMETHEUS] WARNING: No data returned")
+                logger.debug("[PROMETHEUS] WARNING: No data returned")
                 
             return result
         except Exception as e:
-            print(f"[PROMETHEUS] ERROR: {e}")
-            if self.debug:
-                import traceback
-                traceback.print_exc()
+            logger.error("prometheus range_query failed: %s", e)
+            logger.debug("range_query traceback for %s", query, exc_info=True)
             return []
 
+    def _fetch_range(self, query: str, start: datetime, end: datetime, step: str = "1m") -> List[Dict]:
+        """
+        Run a range query against the HTTP API and return data.result.
+        
+        Calls Prometheus directly (rather than PrometheusConnect) so the body is
+        decoded with orjson. The query is sent as a form body, which keeps long
+        batched expressions clear of URL length limits. Results are served from
+        the module-level query cache when possible. Raises on failure.
+        """
+        start_ts = round(start.timestamp())
+        end_ts = round(end.timestamp())
+        cache_key = (self.url, query, start_ts, end_ts, step)
+        
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            if self.debug:
+                logger.debug("[PROMETHEUS] CACHE HIT: %.80s", query)
+            return cached
+        
+        response = self._session.post(
+            f"{self.url}/api/v1/query_range",
+            data={
+                "query": query,
+                "start": start_ts,
+                "end": end_ts,
+                "step": step
+            },
+            timeout=30
+        )
+        response.raise_for_status()
+        result = json_loads(response.content)["data"]["result"]
+        
+        _cache_put(cache_key, result)
+        return result
+
+    @staticmethod
+    def _job_matcher(jobs: List[str]) -> str:
+        """PromQL label matcher selecting every job in jobs."""
+        def quote(value: str) -> str:
+            return value.replace("\\", "\\\\").replace('"', '\\"')
+        
+        if len(jobs) == 1:
+            return 'job="%s"' % quote(jobs[0])
+        return 'job=~"%s"' % quote("|".join(re.escape(job) for job in jobs))
+    
+    def _range_step(self, start: datetime, end: datetime) -> str:
+        """Query resolution for a window: 1m, or coarser for long windows."""
+        seconds = int((end - start).total_seconds()) // self.MAX_RANGE_SAMPLES
+        return f"{max(60, seconds)}s"
+
+    def _query_job_metrics(
+        self,
+        queries: Dict[str, str],
+        start: datetime,
+        end: datetime,
+        step: str = "1m"
+    ) -> Dict[str, List[Dict]]:
+        """
+        Fetch several metrics, batched into a single request.
+        
+        Each expression is tagged with a distinct SERIES_LABEL value via
+        label_replace() and the tagged expressions are joined with "or". The
+        combined result is split back into per-metric series lists. If the
+        server rejects the combined expression, fall back to one request per
+        metric.
+        
+        Args:
+            queries: Mapping of metric name to PromQL expression
+            start: Range start
+            end: Range end
+            step: Query resolution
+        
+        Returns:
+            Dict mapping metric name to its series (missing if no data)
+        """
+        if not self.batch_queries or len(queries) < 2:
+            return {name: self.range_query(query, start, end, step) for name, query in queries.items()}
+        
+        combined = " or ".join(
+            f'label_replace({query}, "{self.SERIES_LABEL}", "{name}", "", "")'
+            for name, query in queries.items()
+        )
+        
+        if self.debug:
+            logger.debug("[PROMETHEUS] BATCHED QUERY: %d expressions", len(queries))
+        
+        try:
+            series_list = self._fetch_range(combined, start, end, step)
+        except Exception as e:
+            logger.warning("[PROMETHEUS] Batched query failed (%s), falling back to per-metric queries", e)
+            return {name: self.range_query(query, start, end, step) for name, query in queries.items()}
+        
+        results: Dict[str, List[Dict]] = {}
+        for series in series_list:
+            labels = dict(series.get("metric", {}))
+            name = labels.pop(self.SERIES_LABEL, None)
+            if name is None:
+                continue
+            results.setdefault(name, []).append({**series, "metric": labels})
+        
+        return results
+
     def instant_query(self, query: str) -> List[Dict]:
         """Execute a Prometheus instant query."""
         if self.debug:
-            print(f"[PROMETHEUS] INSTANT QUERY: {query}")
+            logger.debug("[PROMETHEUS] INSTANT QUERY: %s", query)
         
         try:
             result = self.client.custom_query(query=query)
             return result
         except Exception as e:
-            print(f"[PROMETHEUS] ERROR: {e}")
+            logger.error("[PROMETHEUS] Instant query failed: %s", e)
             return []
 
     def get_available_jobs(self) -> List[str]:
-        """Discover available jobs from Prometheus."""
+        """Discover available jobs from Prometheus (cached for a short TTL)."""
+        cached_at, cached_jobs = self._jobs_cache
+        if cached_jobs is not None and time.monotonic() - cached_at < self.JOBS_CACHE_TTL_SECONDS:
+            return list(cached_jobs)
+        
         try:
             result = self.instant_query('up')
             jobs = set()
@@ -92,10 +350,18 @@ class PrometheusAgent:
                     if 'metric' in metric and 'job' in metric['metric']:
                         jobs.add(metric['metric']['job'])
             
-            return sorted(list(jobs))
+            jobs = sorted(jobs)
+            if jobs:
+                self._jobs_cache = (time.monotonic(), jobs)
+            return list(jobs)
         except Exception as e:
-            print(f"[PROMETHEUS] ERROR discovering jobs: {e}")
+            logger.error("[PROMETHEUS] Error discovering jobs: %s", e)
             return []
+
+    def refresh_jobs(self) -> List[str]:
+        """Drop the cached job list and re-discover jobs from Prometheus."""
+        self._jobs_cache = (0.0, None)
+        return self.get_available_jobs()
     
     def get_data_time_range(self, job: str, metric: str = "up") -> Dict[str, Any]:
         """Get the time range where data is available for a job."""
@@ -149,6 +415,10 @@ class PrometheusAgent:
             })
         # Handle list of metric results
         elif isinstance(data, list):
+            # Range queries share aligned step timestamps across series, so
+            # format each distinct timestamp once instead of once per sample
+            iso_times: Dict[float, str] = {}
+            
             for series in data:
                 if not isinstance(series, dict):
                     continue
@@ -158,18 +428,21 @@ class PrometheusAgent:
                 
                 for timestamp, value in values:
                     try:
+                        iso_time = iso_times.get(timestamp)
+                        if iso_time is None:
+                            iso_time = iso_times[timestamp] = datetime.fromtimestamp(timestamp).isoformat()
                         parsed_data.append({
-                            "time": datetime.fromtimestamp(timestamp).isoformat(),
+                            "time": iso_time,
                             "value": float(value),
                             "labels": metric_labels
                         })
                     except (ValueError, TypeError) as e:
                         if self.debug:
-                            print(f"[PROMETHEUS] WARNING: Could not parse value: {value}, error: {e}")
+                            logger.debug("[PROMETHEUS] Could not parse value: %s, error: %s", value, e)
                         continue
         
         return parsed_data
-    # In your PrometheusAgent class from the first code block
+
     def collect_filtered_metrics(
         self,
         incident_time: str,
@@ -200,92 +473,48 @@ class PrometheusAgent:
         
         # Filter if requested
         if metrics_filter and evidence:
-            filtered_evidence = []
-            for ev in evidence:
-                metric_name = ev.metadata.get("metric", "")
-                # Check if any filter keyword matches the metric name
-                if any(filter_keyword in metric_name for filter_keyword in metrics_filter):
-                    filtered_evidence.append(ev)
-                # Also check metric categories
-                elif self._metric_matches_category(metric_name, metrics_filter):
-                    filtered_evidence.append(ev)
+            matcher = self._compile_metrics_filter(metrics_filter)
+            filtered_evidence = [
+                ev for ev in evidence
+                if matcher.search(ev.metadata.get("metric", ""))
+            ]
             
             if self.debug:
-                print(f"[PROMETHEUS] Filtered from {len(evidence)} to {len(filtered_evidence)} metrics")
+                logger.debug("[PROMETHEUS] Filtered from %d to %d metrics", len(evidence), len(filtered_evidence))
             
             return filtered_evidence
         
         return evidence
 
+    CATEGORY_KEYWORDS = {
+        "cpu": ["cpu_usage", "process_cpu"],
+        "memory": ["memory_usage", "process_resident_memory", "process_virtual_memory"],
+        "latency": ["latency_", "request_duration"],
+        "http": ["http_requests", "http_response"],
+        "error": ["5xx", "4xx", "error"]
+    }
 
-    def collect_filtered_metrics(
-        self,
-        incident_time: str,
-        window_minutes: int = 30,
-        jobs: Optional[List[str]] = None,
-        metrics_filter: Optional[List[str]] = None
-    ) -> List[Evidence]:
+    def _compile_metrics_filter(self, filters: List[str]) -> "re.Pattern":
         """
-        Collect metrics with optional filtering.
+        Compile filter keywords and the keywords of any category they name
+        into a single alternation, so each metric name is scanned once.
         
-        Args:
-            incident_time: ISO timestamp
-            window_minutes: Time window
-            jobs: Jobs to query
-            metrics_filter: List of metric names to collect (None for all)
-        
-        Returns:
-            Filtered list of Evidence
+        Filter keywords match case-sensitively; category keywords match
+        case-insensitively.
         """
-        # Collect all metrics first
-        evidence = self.collect_incident_metrics(
-            incident_time=incident_time,
-            window_minutes=window_minutes,
-            jobs=jobs,
-            include_stats=True,
-            detect_anomalies=True
-        )
-        
-        # Filter if requested
-        if metrics_filter and evidence:
-            filtered_evidence = []
-            for ev in evidence:
-                metric_name = ev.metadata.get("metric", "")
-                # Check if any filter keyword matches the metric name
-                if any(filter_keyword in metric_name for filter_keyword in metrics_filter):
-                    filtered_evidence.append(ev)
-                # Also check metric categories
-                elif self._metric_matches_category(metric_name, metrics_filter):
-                    filtered_evidence.append(ev)
-            
-            if self.debug:
-                print(f"[PROMETHEUS] Filtered from {len(evidence)} to {len(filtered_evidence)} metrics")
-            
-            return filtered_evidence
-        
-        return evidence
-
-
-    def _metric_matches_category(self, metric_name: str, filters: List[str]) -> bool:
-        """Check if a metric belongs to a requested category."""
-        category_mapping = {
-            "cpu": ["cpu_usage", "process_cpu"],
-            "memory": ["memory_usage", "process_resident_memory", "process_virtual_memory"],
-            "latency": ["latency_", "request_duration"],
-            "http": ["http_requests", "http_response"],
-            "error": ["5xx", "4xx", "error"]
-        }
-        
+        direct = {re.escape(keyword) for keyword in filters if keyword}
+        category = set()
         for filter_keyword in filters:
             filter_lower = filter_keyword.lower()
-            for category, keywords in category_mapping.items():
-                if category in filter_lower:
-                    # Check if this metric matches any keyword in the category
-                    if any(keyword in metric_name.lower() for keyword in keywords):
-                        return True
+            for name, keywords in self.CATEGORY_KEYWORDS.items():
+                if name in filter_lower:
+                    category.update(re.escape(keyword) for keyword in keywords)
         
-        return False
-
+        alternatives = sorted(direct)
+        if category:
+            alternatives.append("(?i:%s)" % "|".join(sorted(category)))
+        # An empty alternation would match everything; "(?!)" matches nothing
+        return re.compile("|".join(alternatives) or "(?!)")
 
     def collect_evidence_for_state_machine(
         self,
@@ -311,27 +540,6 @@ class PrometheusAgent:
             include_stats=True,
             detect_anomalies=True
         )
-
-    def _metric_matches_category(self, metric_name: str, filters: List[str]) -> bool:
-        """Check if a metric belongs to a requested category."""
-        category_mapping = {
-            "cpu": ["cpu_usage", "process_cpu"],
-            "memory": ["memory_usage", "process_resident_memory", "process_virtual_memory"],
-            "latency": ["latency_", "request_duration"],
-            "http": ["http_requests", "http_response"],
-            "error": ["5xx", "4xx", "error"]
-        }
-        
-        for filter_keyword in filters:
-            filter_lower = filter_keyword.lower()
-            for category, keywords in category_mapping.items():
-                if category in filter_lower:
-                    # Check if this metric matches any keyword in the category
-                    if any(keyword in metric_name.lower() for keyword in keywords):
-                        return True
-        
-        return False
-
     def calculate_metric_stats(self, parsed_data: List[Dict[str, Any]]) -> Dict[str, float]:
         """Calculate basic statistics for a metric."""
         if not parsed_data:
@@ -403,37 +611,109 @@ class PrometheusAgent:
                     })
         
         return anomalies
-    # Inside the PrometheusAgent class in your first code block
-    def collect_evidence_for_state_machine(
+
+    def _expand_metric(self, metric_name: str, raw_data: List[Dict]) -> List[Tuple[str, List[Dict]]]:
+        """
+        Split a query result into (metric_name, series) pairs.
+        
+        Most queries map to a single metric. The latency bucket query is turned
+        into one synthetic metric per quantile, computed locally, and the
+        per-status request rate is split into one metric per status class
+        plus their total.
+        """
+        if metric_name == "http_requests_by_status":
+            expanded = []
+            totals: Dict[float, float] = {}
+            for series in raw_data:
+                status = series.get("metric", {}).get("status")
+                if status:
+                    expanded.append((f"http_requests_{status}", [series]))
+                for timestamp, value in series.get("values", []):
+                    try:
+                        totals[timestamp] = totals.get(timestamp, 0.0) + float(value)
+                    except (TypeError, ValueError):
+                        continue
+            if totals:
+                total_series = {"metric": {}, "values": [[ts, totals[ts]] for ts in sorted(totals)]}
+                expanded.insert(0, ("http_requests_rate", [total_series]))
+            return expanded
+        
+        if metric_name == "latency_buckets":
+            quantiles = compute_quantiles(raw_data, self.latency_quantiles.values())
+            expanded = []
+            for name, q in self.latency_quantiles.items():
+                if quantiles.get(q):
+                    expanded.append((name, [{"metric": {"quantile": str(q)}, "values": quantiles[q]}]))
+            return expanded
+        
+        return [(metric_name, raw_data)]
+
+    def _build_metric_evidence(
         self,
+        metric_name: str,
+        job: str,
+        query: str,
+        raw_data: List[Dict],
+        window_minutes: int,
         incident_time: str,
-        window_minutes: int = 30,
-        affected_services: Optional[List[str]] = None
-    ) -> List[Evidence]:
+        include_stats: bool = True,
+        detect_anomalies: bool = True,
+        collected_at: Optional[str] = None
+    ) -> Optional[Evidence]:
         """
-        Wrapper method specifically for the LangGraph state machine.
+        Parse one metric's series and wrap it in an Evidence object.
         
-        Args:
-            incident_time: ISO format timestamp
-            window_minutes: Time window around incident
-            affected_services: Services to query
-            
-        Returns:
-            List of Evidence objects in the format expected by the state machine
+        collected_at is the shared collection timestamp for the whole run;
+        it defaults to the current UTC time.
         """
-        return self.collect_incident_metrics(
-            incident_time=incident_time,
-            window_minutes=window_minutes,
-            jobs=affected_services,
-            include_stats=True,
-            detect_anomalies=True
+        # Parse and structure the data
+        parsed_data = self.parse_metric_data(raw_data)
+        
+        if not parsed_data:
+            return None
+
+        # Build metadata
+        metadata = {
+            "metric": metric_name,
+            "job": job,
+            "query": query,
+            "window_minutes": window_minutes,
+            "incident_time": incident_time,
+            "data_points": len(parsed_data)
+        }
+        
+        # Add statistics if requested
+        if include_stats:
+            stats = self.calculate_metric_stats(parsed_data)
+            metadata["stats"] = stats
+        
+        # Detect anomalies if requested
+        anomalies = []
+        if detect_anomalies:
+            anomalies = self.detect_anomalies(parsed_data, metric_name)
+            if anomalies:
+                metadata["anomalies"] = anomalies
+                metadata["anomaly_count"] = len(anomalies)
+
+        # Create evidence object
+        evidence = Evidence(
+            source="prometheus",
+            content=json_dumps(parsed_data),
+            timestamp=collected_at or datetime.utcnow().isoformat(),
+            confidence=0.95,
+            metadata=metadata
         )
-
-# Fix 1: Add 'self' parameter to collect_incident_metrics method
-# Replace this method in your PrometheusAgent class:
+        
+        if self.debug:
+            logger.debug(
+                "[PROMETHEUS] Collected %s: %d data points (%d anomalies)",
+                metric_name, len(parsed_data), len(anomalies)
+            )
+        
+        return evidence
 
     def collect_incident_metrics(
-        self,  # <-- ADD THIS
+        self,
         incident_time: str, 
         window_minutes: int = 30, 
         jobs: Optional[List[str]] = None,
@@ -458,13 +738,13 @@ class PrometheusAgent:
         # Auto-discover jobs if not provided
         if jobs is None or len(jobs) == 0:
             if self.debug:
-                print("[PROMETHEUS] Auto-discovering jobs...")
+                logger.debug("[PROMETHEUS] Auto-discovering jobs...")
             jobs = self.get_available_jobs()
             if self.debug:
-                print(f"[PROMETHEUS] Found jobs: {jobs}")
+                logger.debug("[PROMETHEUS] Found jobs: %s", jobs)
         
         if not jobs:
-            print("[PROMETHEUS] WARNING: No jobs available to query")
+            logger.warning("[PROMETHEUS] No jobs available to query")
             return evidence_list
 
         # Parse incident time and create time window
@@ -473,74 +753,66 @@ class PrometheusAgent:
         end = incident_dt + timedelta(minutes=window_minutes)
         
         if self.debug:
-            print(f"\n[PROMETHEUS] Incident time: {incident_dt}")
-            print(f"[PROMETHEUS] Query window: {start} to {end} ({window_minutes*2} minutes)")
+            logger.debug("[PROMETHEUS] Incident time: %s", incident_dt)
+            logger.debug("[PROMETHEUS] Query window: %s to %s (%d minutes)", start, end, window_minutes * 2)
+
+        # All evidence from one collection run shares a single timestamp
+        collected_at = datetime.utcnow().isoformat()
+
+        # Every query selects all jobs at once (job=~"a|b|..."), so one
+        # batched request covers every metric of every job
+        matcher = self._job_matcher(jobs)
+        queries = {}
+        for metric_name, query_template in self.metrics.items():
+            # Some metrics need the matcher twice (like avg calculations)
+            matcher_count = query_template.count("%s")
+            queries[metric_name] = query_template % tuple([matcher] * matcher_count)
+        
+        results_by_metric = self._query_job_metrics(queries, start, end, self._range_step(start, end))
+        
+        # Split the series back out per job, keeping the order jobs were given
+        job_results: Dict[str, Dict[str, List[Dict]]] = {job: {} for job in jobs}
+        for metric_name, series_list in results_by_metric.items():
+            for series in series_list:
+                results = job_results.get(series.get("metric", {}).get("job"))
+                if results is not None:
+                    results.setdefault(metric_name, []).append(series)
 
         # Collect metrics for each job
-        for job in jobs:
+        for job, results in job_results.items():
             if self.debug:
-                print(f"\n[PROMETHEUS] Processing job: {job}")
+                logger.debug("[PROMETHEUS] Processing job: %s", job)
             
-            for metric_name, query_template in self.metrics.items():
-                # Some metrics need the job name twice (like avg calculations)
-                job_count = query_template.count("%s")
-                query = query_template % tuple([job] * job_count)
-                
-                # Execute query
-                raw_data = self.range_query(query, start, end)
+            for metric_name, query in queries.items():
+                raw_data = results.get(metric_name)
                 
                 if not raw_data:
                     if self.debug:
-                        print(f"[PROMETHEUS] No data for {metric_name} on job {job}")
+                        logger.debug("[PROMETHEUS] No data for %s on job %s", metric_name, job)
                     continue
 
-                # Parse and structure the data
-                parsed_data = self.parse_metric_data(raw_data)
-                
-                if not parsed_data:
-                    continue
-
-                # Build metadata
-                metadata = {
-                    "metric": metric_name,
-                    "job": job,
-                    "query": query,
-                    "window_minutes": window_minutes,
-                    "incident_time": incident_time,
-                    "data_points": len(parsed_data)
-                }
-                
-                # Add statistics if requested
-                if include_stats:
-                    stats = self.calculate_metric_stats(parsed_data)
-                    metadata["stats"] = stats
-                
-                # Detect anomalies if requested
-                anomalies = []
-                if detect_anomalies:
-                    anomalies = self.detect_anomalies(parsed_data, metric_name)
-                    if anomalies:
-                        metadata["anomalies"] = anomalies
-                        metadata["anomaly_count"] = len(anomalies)
-
-                # Create evidence object
-                evidence = Evidence(
-                    source="prometheus",
-                    content=json.dumps(parsed_data, indent=2),
-                    timestamp=datetime.utcnow().isoformat(),
-                    confidence=0.95,
-                    metadata=metadata
-                )
-                evidence_list.append(evidence)
-                
-                if self.debug:
-                    anomaly_info = f" ({len(anomalies)} anomalies)" if detect_anomalies and anomalies else ""
-                    print(f"[PROMETHEUS] ✓ Collected {metric_name}: {len(parsed_data)} data points{anomaly_info}")
+                # Derived queries (e.g. histogram buckets) fan out into several metrics
+                for name, series in self._expand_metric(metric_name, raw_data):
+                    evidence = self._build_metric_evidence(
+                        metric_name=name,
+                        job=job,
+                        query=query,
+                        raw_data=series,
+                        window_minutes=window_minutes,
+                        incident_time=incident_time,
+                        include_stats=include_stats,
+                        detect_anomalies=detect_anomalies,
+                        collected_at=collected_at
+                    )
+                    if evidence is not None:
+                        evidence_list.append(evidence)
 
         if self.debug:
-            print(f"\n[PROMETHEUS] Total evidence collected: {len(evidence_list)}")
+            logger.debug("[PROMETHEUS] Total evidence collected: %d", len(evidence_list))
         
         return evidence_list
+
+
 def collect_prometheus_metrics(
     incident_time: str,
     window_minutes: int = 30,
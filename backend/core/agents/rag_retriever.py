@@ -13,9 +13,18 @@ Usage:
     )
 """
 
+import math
+import random
+from array import array
+from operator import mul
 import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -24,26 +33,284 @@ from agents.verifier import Evidence
 
 # Try to import vector search
 try:
-    from vector_db.query import search_incidents, search_runbooks
+    from vector_db.query import (
+        embed_query,
+        get_searcher,
+        search_incidents_by_vector,
+        search_runbooks_by_vector
+    )
     VECTOR_SEARCH_AVAILABLE = True
 except ImportError:
     VECTOR_SEARCH_AVAILABLE = False
     print("⚠️  Vector search not available for RAG.")
 
 
+# Generic runbooks served when vector search is unavailable, keyed by the
+# symptom keywords that select them
+FALLBACK_RUNBOOKS = [
+    (frozenset({'memory', 'leak', 'oom'}),
+     "Runbook: Memory Issues - Check for memory leaks, review heap dumps, monitor GC activity"),
+    (frozenset({'cpu', 'spike', 'high'}),
+     "Runbook: High CPU - Profile application, check for infinite loops, review thread dumps"),
+    (frozenset({'connection', 'timeout', 'pool'}),
+     "Runbook: Connection Issues - Verify pool configuration, check network latency, review firewall rules"),
+]
+
+
+def _normalize_query(query: str) -> str:
+    """Collapse whitespace and case so equivalent queries share a cache entry"""
+    return " ".join(query.lower().split())
+
+
+@lru_cache(maxsize=1024)
+def _cached_embedding(query: str) -> array:
+    """
+    Query embedding (query must be normalized).
+    
+    Shared by the semantic cache and both searches, so each distinct query
+    costs one embedding call per retrieval rather than one per index. Held
+    as a packed float32 array (the model's own precision) rather than a
+    tuple of Python floats, which is about 8x smaller per cached entry.
+    """
+    return array("f", embed_query(query))
+
+
+# Vector search results keyed by (index, normalized query, ...). The TTL
+# lets newly indexed incidents and runbooks show up. Empty results aren't
+# cached: the search functions return [] for Pinecone errors and missing
+# indexes too, and one of those shouldn't stick for the process lifetime.
+SEARCH_CACHE_TTL_SECONDS = 300
+SEARCH_CACHE_MAX_ENTRIES = 1024
+_search_cache: "OrderedDict[Tuple, Tuple[float, Tuple[Dict, ...]]]" = OrderedDict()
+_search_cache_lock = threading.Lock()
+
+
+def _search_cache_get(key: Tuple) -> Optional[Tuple[Dict, ...]]:
+    """Return cached search results if present and not expired"""
+    with _search_cache_lock:
+        entry = _search_cache.get(key)
+        if entry is None:
+            return None
+        stored_at, results = entry
+        if time.monotonic() - stored_at >= SEARCH_CACHE_TTL_SECONDS:
+            del _search_cache[key]
+            return None
+        _search_cache.move_to_end(key)
+        return results
+
+
+def _search_cache_put(key: Tuple, results: Tuple[Dict, ...]) -> None:
+    """Store non-empty search results, evicting the least recently used entry"""
+    if not results:
+        return
+    with _search_cache_lock:
+        _search_cache[key] = (time.monotonic(), results)
+        _search_cache.move_to_end(key)
+        while len(_search_cache) > SEARCH_CACHE_MAX_ENTRIES:
+            _search_cache.popitem(last=False)
+
+
+def _cached_search_incidents(query: str, top_k: int, services: Tuple[str, ...]) -> Tuple[Dict, ...]:
+    """Cached vector search over historical incidents (query must be normalized)"""
+    key = ("incidents", query, top_k, services)
+    results = _search_cache_get(key)
+    if results is None:
+        results = tuple(search_incidents_by_vector(
+            query_vector=_cached_embedding(query).tolist(),
+            top_k=top_k,
+            min_similarity=0.6,
+            service_filter=list(services) if services else None
+        ))
+        _search_cache_put(key, results)
+    return results
+
+
+def _cached_search_runbooks(query: str, top_k: int) -> Tuple[Dict, ...]:
+    """Cached vector search over runbooks (query must be normalized)"""
+    key = ("runbooks", query, top_k)
+    results = _search_cache_get(key)
+    if results is None:
+        results = tuple(search_runbooks_by_vector(
+            query_vector=_cached_embedding(query).tolist(),
+            top_k=top_k,
+            min_similarity=0.5
+        ))
+        _search_cache_put(key, results)
+    return results
+
+
+def search_cache_info() -> Dict[str, object]:
+    """Embedding cache statistics and the number of cached search results"""
+    with _search_cache_lock:
+        searches = len(_search_cache)
+    return {
+        "embeddings": _cached_embedding.cache_info(),
+        "searches": searches
+    }
+
+
+def clear_search_cache() -> None:
+    """Drop cached search results, e.g. after re-indexing"""
+    with _search_cache_lock:
+        _search_cache.clear()
+    if _retriever_instance is not None and _retriever_instance.semantic_cache is not None:
+        _retriever_instance.semantic_cache.clear()
+
+
+class SemanticCache:
+    """
+    Approximate cache of retrieval results keyed by query embedding.
+    
+    Queries whose embeddings have cosine similarity >= threshold reuse the
+    earlier results, so rephrasings like "cpu_spike api-gateway" and
+    "api-gateway high cpu" share an entry. Embeddings are bucketed with
+    random-hyperplane LSH; a lookup probes the query's bucket and every
+    bucket one hyperplane away, then compares exactly within them. The
+    oldest entries are evicted first once max_entries is reached, and
+    entries older than ttl_seconds are treated as misses.
+    
+    Stored embeddings are scalar-quantized to int8 (unit vector * 127), which
+    keeps a full cache of 1024-d embeddings around 2 MB instead of tens of MB
+    of Python floats. Lookups quantize the query the same way and compare in
+    integer arithmetic. The quantization error is far below the threshold
+    margin.
+    """
+    
+    QUANT_SCALE = 127
+    
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 2048,
+        num_planes: int = 8,
+        seed: int = 0,
+        ttl_seconds: float = 300
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.num_planes = num_planes
+        self._rng = random.Random(seed)
+        self._planes: Optional[List[List[float]]] = None
+        
+        # entry id -> (bucket, scope, int8 unit vector, evidence, stored_at),
+        # in insertion order
+        self._entries: OrderedDict = OrderedDict()
+        self._buckets: Dict[int, set] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _unit(vector: List[float]) -> List[float]:
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+    
+    @classmethod
+    def _quantize(cls, unit: List[float]) -> array:
+        return array("b", (round(v * cls.QUANT_SCALE) for v in unit))
+    
+    def _bucket(self, vector: List[float]) -> int:
+        if self._planes is None:
+            dim = len(vector)
+            self._planes = [
+                [self._rng.gauss(0.0, 1.0) for _ in range(dim)]
+                for _ in range(self.num_planes)
+            ]
+        
+        bucket = 0
+        for bit, plane in enumerate(self._planes):
+            if sum(p * v for p, v in zip(plane, vector)) >= 0:
+                bucket |= 1 << bit
+        return bucket
+    
+    def _pop_oldest(self) -> None:
+        old_id, (old_bucket, _, _, _, _) = self._entries.popitem(last=False)
+        self._buckets[old_bucket].discard(old_id)
+        if not self._buckets[old_bucket]:
+            del self._buckets[old_bucket]
+    
+    def _expire(self) -> None:
+        # Entries are in insertion order, so expired ones are at the front
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._entries and next(iter(self._entries.values()))[4] < cutoff:
+            self._pop_oldest()
+    
+    def get(self, vector: List[float], scope: Tuple) -> Optional[List[Evidence]]:
+        """Return copies of cached evidence for a near-identical query, if any"""
+        unit = self._unit(vector)
+        query = self._quantize(unit)
+        
+        with self._lock:
+            self._expire()
+            bucket = self._bucket(unit)
+            # Both sides are scaled by QUANT_SCALE, so the dot product is too
+            best_sim, best = self.threshold * self.QUANT_SCALE ** 2, None
+            
+            for probe in [bucket] + [bucket ^ (1 << bit) for bit in range(self.num_planes)]:
+                for entry_id in self._buckets.get(probe, ()):
+                    _, entry_scope, entry_vector, evidence, _ = self._entries[entry_id]
+                    if entry_scope != scope:
+                        continue
+                    sim = sum(map(mul, query, entry_vector))
+                    if sim >= best_sim:
+                        best_sim, best = sim, evidence
+        
+        if best is None:
+            return None
+        return [replace(ev) for ev in best]
+    
+    def put(self, vector: List[float], scope: Tuple, evidence: List[Evidence]) -> None:
+        """
+        Cache evidence for a query embedding. Empty results aren't cached,
+        since they may come from a failed search.
+        """
+        if not evidence:
+            return
+        unit = self._unit(vector)
+        
+        with self._lock:
+            self._expire()
+            bucket = self._bucket(unit)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (
+                bucket, scope, self._quantize(unit), [replace(ev) for ev in evidence], time.monotonic()
+            )
+            self._buckets.setdefault(bucket, set()).add(entry_id)
+            
+            while len(self._entries) > self.max_entries:
+                self._pop_oldest()
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+
 class RAGRetriever:
     """
     Retrieval-Augmented Generation agent for historical knowledge.
     """
     
-    def __init__(self, use_vector_search: bool = True):
+    __slots__ = ('use_vector_search', 'semantic_cache')
+    
+    def __init__(self, use_vector_search: bool = True, semantic_cache: bool = True):
         """
         Initialize RAG retriever.
         
         Args:
             use_vector_search: Whether to use vector search
+            semantic_cache: Whether to reuse results for near-identical queries
         """
         self.use_vector_search = use_vector_search and VECTOR_SEARCH_AVAILABLE
+        self.semantic_cache = SemanticCache() if semantic_cache and self.use_vector_search else None
+        
+        if self.use_vector_search:
+            # Resolve index handles now so the first retrieval doesn't pay for it
+            try:
+                get_searcher().warm_up()
+            except Exception as e:
+                print(f"⚠️  Could not warm up vector search: {e}")
     
     def retrieve_knowledge(
         self,
@@ -71,6 +338,20 @@ class RAGRetriever:
         
         query = " ".join(query_parts)
         
+        # Serve near-identical queries from the semantic cache
+        query_vector = None
+        scope = tuple(sorted(set(services))) if services else ()
+        if self.semantic_cache is not None:
+            try:
+                query_vector = _cached_embedding(_normalize_query(query))
+            except Exception as e:
+                print(f"⚠️  Could not embed query for semantic cache: {e}")
+            
+            if query_vector is not None:
+                cached = self.semantic_cache.get(query_vector, scope)
+                if cached is not None:
+                    return cached
+        
         if self.use_vector_search:
             # Search historical incidents
             incident_evidence = self._search_incidents(query, services)
@@ -88,6 +369,10 @@ class RAGRetriever:
         evidence = self._deduplicate(evidence)
         evidence = self._rank_by_relevance(evidence)
         
+        # Empty results may be a failed search; don't let paraphrases reuse them
+        if query_vector is not None and evidence:
+            self.semantic_cache.put(query_vector, scope, evidence)
+        
         return evidence
     
     def _search_incidents(
@@ -97,11 +382,10 @@ class RAGRetriever:
     ) -> List[Evidence]:
         """Search historical incidents using vector search"""
         
-        results = search_incidents(
-            query=query,
-            top_k=5,
-            min_similarity=0.6,
-            service_filter=services if services else None
+        results = _cached_search_incidents(
+            _normalize_query(query),
+            5,
+            tuple(sorted(set(services))) if services else ()
         )
         
         evidence = []
@@ -127,11 +411,7 @@ class RAGRetriever:
     def _search_runbooks(self, query: str) -> List[Evidence]:
         """Search runbooks and documentation"""
         
-        results = search_runbooks(
-            query=query,
-            top_k=3,
-            min_similarity=0.5
-        )
+        results = _cached_search_runbooks(_normalize_query(query), 3)
         
         evidence = []
         for runbook in results:
@@ -155,26 +435,27 @@ class RAGRetriever:
     
     def _format_incident(self, incident: Dict) -> str:
         """Format historical incident for display"""
-        parts = []
+        get = incident.get
+        root_cause = get('root_cause')
+        symptoms = get('symptoms')
+        services = get('services')
+        resolution = get('resolution')
         
-        incident_id = incident.get('incident_id', incident.get('id', 'Unknown'))
-        parts.append(f"Historical Incident {incident_id}")
+        parts = [f"Historical Incident {get('incident_id', get('id', 'Unknown'))}"]
         
-        if incident.get('root_cause'):
-            parts.append(f"Root Cause: {incident['root_cause']}")
+        if root_cause:
+            parts.append(f"Root Cause: {root_cause}")
         
-        if incident.get('symptoms'):
-            parts.append(f"Symptoms: {incident['symptoms']}")
+        if symptoms:
+            parts.append(f"Symptoms: {symptoms}")
         
-        if incident.get('services'):
-            services = incident['services']
+        if services:
             if isinstance(services, list):
                 services = ', '.join(services)
             parts.append(f"Services: {services}")
         
-        if incident.get('resolution'):
+        if resolution:
             # Truncate long resolutions
-            resolution = incident['resolution']
             if len(resolution) > 150:
                 resolution = resolution[:150] + "..."
             parts.append(f"Resolution: {resolution}")
@@ -192,33 +473,18 @@ class RAGRetriever:
         # Return generic knowledge
         evidence = []
         
-        # Pattern-based knowledge
-        if any(s in str(symptoms).lower() for s in ['memory', 'leak', 'oom']):
-            evidence.append(Evidence(
-                source="runbook",
-                content="Runbook: Memory Issues - Check for memory leaks, review heap dumps, monitor GC activity",
-                timestamp='',
-                confidence=0.5,
-                metadata={'type': 'generic_runbook'}
-            ))
-        
-        if any(s in str(symptoms).lower() for s in ['cpu', 'spike', 'high']):
-            evidence.append(Evidence(
-                source="runbook",
-                content="Runbook: High CPU - Profile application, check for infinite loops, review thread dumps",
-                timestamp='',
-                confidence=0.5,
-                metadata={'type': 'generic_runbook'}
-            ))
-        
-        if any(s in str(symptoms).lower() for s in ['connection', 'timeout', 'pool']):
-            evidence.append(Evidence(
-                source="runbook",
-                content="Runbook: Connection Issues - Verify pool configuration, check network latency, review firewall rules",
-                timestamp='',
-                confidence=0.5,
-                metadata={'type': 'generic_runbook'}
-            ))
+        # Pattern-based knowledge. Keywords match as substrings, so compound
+        # symptoms like "cpu_spike" still hit.
+        symptom_text = " ".join(symptoms).lower()
+        for keywords, content in FALLBACK_RUNBOOKS:
+            if any(keyword in symptom_text for keyword in keywords):
+                evidence.append(Evidence(
+                    source="runbook",
+                    content=content,
+                    timestamp='',
+                    confidence=0.5,
+                    metadata={'type': 'generic_runbook'}
+                ))
         
         return evidence
     
@@ -228,11 +494,10 @@ class RAGRetriever:
         unique_evidence = []
         
         for ev in evidence:
-            # Create a simplified version for comparison
-            simplified = ev.content[:100].lower()
-            
-            if simplified not in seen_content:
-                seen_content.add(simplified)
+            # Full content as the key: str hashes are computed in C and cached
+            # on the string, and entries sharing only a prefix stay distinct
+            if ev.content not in seen_content:
+                seen_content.add(ev.content)
                 unique_evidence.append(ev)
         
         return unique_evidence
@@ -240,32 +505,28 @@ class RAGRetriever:
     def _rank_by_relevance(self, evidence: List[Evidence]) -> List[Evidence]:
         """Rank evidence by relevance (confidence score)"""
         
-        # Sort by confidence (descending)
-        evidence.sort(key=lambda x: x.confidence, reverse=True)
-        
-        # Boost historical incidents over runbooks
-        for ev in evidence:
-            if ev.metadata.get('type') == 'historical_incident':
-                # Already boosted in confidence during search
-                pass
-            elif ev.metadata.get('type') == 'runbook':
-                # Slightly lower runbook confidence
-                ev.confidence *= 0.9
-        
-        # Re-sort after boosting
-        evidence.sort(key=lambda x: x.confidence, reverse=True)
+        # Sort by confidence (descending), ranking runbooks slightly below
+        # historical incidents. The weight only affects ordering; it is not
+        # written back, so repeated ranking doesn't compound it.
+        evidence.sort(
+            key=lambda x: x.confidence * (0.9 if x.metadata.get('type') == 'runbook' else 1.0),
+            reverse=True
+        )
         
         return evidence
 
 
 # Module-level convenience function
 _retriever_instance = None
+_retriever_lock = threading.Lock()
 
 def get_retriever() -> RAGRetriever:
-    """Get or create singleton retriever instance"""
+    """Get or create singleton retriever instance (thread-safe)"""
     global _retriever_instance
     if _retriever_instance is None:
-        _retriever_instance = RAGRetriever()
+        with _retriever_lock:
+            if _retriever_instance is None:
+                _retriever_instance = RAGRetriever()
     return _retriever_instance
 
 
@@ -10,11 +10,14 @@ Usage:
     timeline, correlations, gaps = build_timeline(all_evidence)
 """
 
+import re
 import sys
+import threading
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional
 from datetime import datetime, timedelta
 from collections import defaultdict
+from functools import lru_cache
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -22,11 +25,79 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from agents.verifier import Evidence
 
 
+# Event categories in priority order, with the keywords that select them
+EVENT_CATEGORIES = [
+    ("deployment", ['deploy', 'deployment', 'release']),
+    ("metric_anomaly", ['spike', 'increase', 'high', 'drop', 'low']),
+    ("error", ['error', 'exception', 'failure', 'crash']),
+    ("performance", ['slow', 'timeout', 'latency']),
+    ("capacity", ['memory', 'cpu', 'disk', 'connection']),
+    ("configuration", ['config', 'setting', 'update']),
+]
+
+# Known causal patterns between consecutive event types
+CORRELATION_PATTERNS = {
+    ("deployment", "error"): "Deployment likely caused errors",
+    ("deployment", "metric_anomaly"): "Deployment triggered metric change",
+    ("metric_anomaly", "error"): "Metric anomaly preceded errors",
+    ("capacity", "performance"): "Capacity issue caused performance degradation",
+    ("error", "error"): "Cascading errors",
+    ("configuration", "error"): "Config change may have caused errors"
+}
+
+# Sources every timeline should have, with the gap reported when one is absent
+EXPECTED_SOURCES = {
+    "image": "No dashboard metrics provided",
+    "log": "No application logs provided",
+    "historical": "No historical incident data available"
+}
+
+# Event types that take part in at least one known pattern
+PATTERN_TYPES = frozenset(event_type for pair in CORRELATION_PATTERNS for event_type in pair)
+
+# Pairs whose causal link is strong enough to rate "strong" inside 5 minutes
+STRONG_PATTERNS = frozenset({
+    ("deployment", "error"),
+    ("deployment", "metric_anomaly"),
+    ("configuration", "error")
+})
+
+# Small integer id per event type (category priority order, "other" last).
+# The pair tables below are indexed by these ids so the correlation loop
+# does list indexing instead of hashing string tuples.
+EVENT_TYPES = [category for category, _ in EVENT_CATEGORIES] + ["other"]
+TYPE_IDS = {event_type: type_id for type_id, event_type in enumerate(EVENT_TYPES)}
+
+PATTERN_TABLE = [
+    [CORRELATION_PATTERNS.get((type1, type2)) for type2 in EVENT_TYPES]
+    for type1 in EVENT_TYPES
+]
+STRONG_TABLE = [
+    [(type1, type2) in STRONG_PATTERNS for type2 in EVENT_TYPES]
+    for type1 in EVENT_TYPES
+]
+
+# Leading "YYYY-MM-DD[T ]HH:MM:SS" shared by all the strptime formats
+_DATETIME_PREFIX = re.compile(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}')
+
+# One pattern for every keyword, tagged by category. The lookahead makes
+# finditer report a match at every position, so overlapping keywords
+# (e.g. "low" inside "slow") are all seen in a single scan.
+_EVENT_KEYWORD_PATTERN = re.compile(
+    "(?=%s)" % "|".join(
+        "(?P<%s>%s)" % (category, "|".join(map(re.escape, keywords)))
+        for category, keywords in EVENT_CATEGORIES
+    )
+)
+
+
 class TimelineCorrelator:
     """
     Correlates events across time from multiple evidence sources.
     """
     
+    __slots__ = ('correlation_window',)
+    
     def __init__(self, correlation_window: int = 300):
         """
         Initialize timeline correlator.
@@ -55,6 +126,10 @@ class TimelineCorrelator:
         # Convert evidence to timeline events
         events = self._evidence_to_events(all_evidence)
         
+        # With fewer than two events there is nothing to sort or correlate
+        if len(events) < 2:
+            return events, [], self._find_gaps(events)
+        
         # Sort chronologically
         events = self._sort_events(events)
         
@@ -81,6 +156,11 @@ class TimelineCorrelator:
             
             # Add event type classification
             event["event_type"] = self._classify_event(evidence)
+            event["_type_id"] = TYPE_IDS[event["event_type"]]
+            
+            # Parse the timestamp once; sorting, correlation and gap checks
+            # all work from this
+            event["_dt"] = self._parse_timestamp(evidence.timestamp)
             
             events.append(event)
         
@@ -113,31 +193,18 @@ class TimelineCorrelator:
         """Classify event type for correlation analysis"""
         content_lower = evidence.content.lower()
         
-        # Deployment events
-        if any(word in content_lower for word in ['deploy', 'deployment', 'release']):
-            return "deployment"
-        
-        # Metric anomalies
-        if any(word in content_lower for word in ['spike', 'increase', 'high', 'drop', 'low']):
-            return "metric_anomaly"
-        
-        # Errors
-        if any(word in content_lower for word in ['error', 'exception', 'failure', 'crash']):
-            return "error"
-        
-        # Performance
-        if any(word in content_lower for word in ['slow', 'timeout', 'latency']):
-            return "performance"
-        
-        # Capacity
-        if any(word in content_lower for word in ['memory', 'cpu', 'disk', 'connection']):
-            return "capacity"
-        
-        # Configuration changes
-        if any(word in content_lower for word in ['config', 'setting', 'update']):
-            return "configuration"
-        
-        return "other"
+        # Highest-priority category with any keyword in the content
+        best_rank = len(EVENT_CATEGORIES)
+        for match in _EVENT_KEYWORD_PATTERN.finditer(content_lower):
+            rank = TYPE_IDS[match.lastgroup]
+            if rank < best_rank:
+                best_rank = rank
+                if rank == 0:
+                    break
+        
+        if best_rank == len(EVENT_CATEGORIES):
+            return "other"
+        return EVENT_CATEGORIES[best_rank][0]
     
     def _sort_events(self, events: List[Dict]) -> List[Dict]:
         """Sort events chronologically"""
@@ -154,7 +221,7 @@ class TimelineCorrelator:
         
         # Sort events with timestamps
         try:
-            events_with_time.sort(key=lambda x: self._parse_timestamp(x["time"]))
+            events_with_time.sort(key=lambda x: x["_dt"])
         except Exception as e:
             print(f"⚠️  Failed to sort timeline: {e}")
             # Fall back to string sort
@@ -163,39 +230,74 @@ class TimelineCorrelator:
         # Combine: timestamped events first, then others
         return events_with_time + events_without_time
     
-    def _parse_timestamp(self, timestamp: str) -> datetime:
-        """Parse timestamp string to datetime"""
-        # Handle different timestamp formats
-        formats = [
-            "%Y-%m-%dT%H:%M:%SZ",
-            "%Y-%m-%dT%H:%M:%S.%fZ",
-            "%Y-%m-%dT%H:%M:%S%z",
-            "%Y-%m-%d %H:%M:%S",
-        ]
-        
-        for fmt in formats:
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _parse_timestamp(timestamp: str) -> datetime:
+        """
+        Parse timestamp string to datetime.
+        
+        Cached, since the same timestamps are parsed while sorting, correlating
+        and gap-checking.
+        """
+        if not isinstance(timestamp, str):
+            return datetime(1970, 1, 1)
+        
+        # Every format below starts with a full date and time; anything else
+        # goes straight to the lenient fallback without probing them
+        if _DATETIME_PREFIX.match(timestamp):
+            # Fast path: ISO-8601 via the C parser. A trailing "Z" is dropped
+            # so UTC timestamps stay naive, as the strptime formats produce.
             try:
-                return datetime.strptime(timestamp, fmt)
-            except:
-                continue
+                if timestamp.endswith('Z'):
+                    return datetime.fromisoformat(timestamp[:-1])
+                return datetime.fromisoformat(timestamp)
+            except ValueError:
+                pass
+            
+            # Handle different timestamp formats
+            formats = [
+                "%Y-%m-%dT%H:%M:%SZ",
+                "%Y-%m-%dT%H:%M:%S.%fZ",
+                "%Y-%m-%dT%H:%M:%S%z",
+                "%Y-%m-%d %H:%M:%S",
+            ]
+            
+            for fmt in formats:
+                try:
+                    return datetime.strptime(timestamp, fmt)
+                except ValueError:
+                    continue
         
         # Fallback: try to extract date/time parts
         try:
             # Remove timezone info and try again
             cleaned = timestamp.replace('+00:00', '').replace('Z', '')
             return datetime.fromisoformat(cleaned)
-        except:
+        except ValueError:
             # Default to epoch if all parsing fails
             return datetime(1970, 1, 1)
     
     def _find_correlations(self, events: List[Dict]) -> List[Dict]:
         """Find temporal correlations between events"""
         correlations = []
-        
-        # Look for patterns in adjacent events
-        for i in range(len(events) - 1):
-            for j in range(i + 1, min(i + 5, len(events))):  # Check next 4 events
-                corr = self._check_correlation(events[i], events[j])
+        window = self.correlation_window
+        n = len(events)
+        
+        # If no event type on the timeline takes part in a known pattern,
+        # only the generic nearby-events correlation can fire
+        check_patterns = not PATTERN_TYPES.isdisjoint(event["event_type"] for event in events)
+        
+        # Look for patterns in adjacent events. The time difference is a plain
+        # subtraction of the pre-parsed datetimes, so pairs outside the
+        # correlation window are dropped before any pattern matching.
+        for i in range(n - 1):
+            event1 = events[i]
+            for j in range(i + 1, min(i + 5, n)):  # Check next 4 events
+                event2 = events[j]
+                time_diff = self._dt_diff(event1, event2)
+                if time_diff is None or time_diff > window:
+                    continue
+                corr = self._check_correlation(event1, event2, time_diff, check_patterns)
                 if corr:
                     correlations.append(corr)
         
@@ -204,11 +306,23 @@ class TimelineCorrelator:
         
         return correlations
     
-    def _check_correlation(self, event1: Dict, event2: Dict) -> Optional[Dict]:
-        """Check if two events are temporally correlated"""
+    def _check_correlation(
+        self,
+        event1: Dict,
+        event2: Dict,
+        time_diff: Optional[float] = None,
+        check_patterns: bool = True
+    ) -> Optional[Dict]:
+        """
+        Check if two events are temporally correlated.
+        
+        With check_patterns False the known-pattern lookup is skipped and only
+        the generic nearby-events correlation is considered.
+        """
         
         # Calculate time difference
-        time_diff = self._calculate_time_diff(event1["time"], event2["time"])
+        if time_diff is None:
+            time_diff = self._dt_diff(event1, event2)
         
         if time_diff is None:
             return None
@@ -222,25 +336,22 @@ class TimelineCorrelator:
         type2 = event2["event_type"]
         
         # Known correlation patterns
-        correlation_patterns = {
-            ("deployment", "error"): "Deployment likely caused errors",
-            ("deployment", "metric_anomaly"): "Deployment triggered metric change",
-            ("metric_anomaly", "error"): "Metric anomaly preceded errors",
-            ("capacity", "performance"): "Capacity issue caused performance degradation",
-            ("error", "error"): "Cascading errors",
-            ("configuration", "error"): "Config change may have caused errors"
-        }
-        
-        pattern_key = (type1, type2)
-        if pattern_key in correlation_patterns:
+        if check_patterns:
+            type_id1 = event1["_type_id"]
+            type_id2 = event2["_type_id"]
+            pattern = PATTERN_TABLE[type_id1][type_id2]
+        else:
+            pattern = None
+        
+        if pattern is not None:
             return {
                 "event1": event1["event"],
                 "event2": event2["event"],
                 "time1": event1["time"],
                 "time2": event2["time"],
                 "time_delta_seconds": time_diff,
-                "pattern": correlation_patterns[pattern_key],
-                "strength": self._calculate_correlation_strength(time_diff, type1, type2),
+                "pattern": pattern,
+                "strength": self._calculate_correlation_strength(time_diff, type_id1, type_id2),
                 "causal_direction": "event1 → event2"
             }
         
@@ -259,22 +370,25 @@ class TimelineCorrelator:
         
         return None
     
-    def _calculate_time_diff(self, time1: str, time2: str) -> Optional[float]:
-        """Calculate time difference in seconds"""
+    def _dt_diff(self, event1: Dict, event2: Dict) -> Optional[float]:
+        """Time difference in seconds between two events' parsed timestamps"""
+        dt1 = event1.get("_dt")
+        dt2 = event2.get("_dt")
+        if dt1 is None or dt2 is None:
+            return None
         try:
-            dt1 = self._parse_timestamp(time1)
-            dt2 = self._parse_timestamp(time2)
             return abs((dt2 - dt1).total_seconds())
-        except:
+        except TypeError:
+            # Naive and timezone-aware datetimes can't be compared
             return None
     
     def _calculate_correlation_strength(
         self,
         time_diff: float,
-        type1: str,
-        type2: str
+        type_id1: int,
+        type_id2: int
     ) -> str:
-        """Calculate correlation strength"""
+        """Calculate correlation strength (event types given as TYPE_IDS)"""
         
         # Closer in time = stronger correlation
         if time_diff < 60:  # Within 1 minute
@@ -285,13 +399,7 @@ class TimelineCorrelator:
             base_strength = "weak"
         
         # Boost for known causal patterns
-        strong_patterns = [
-            ("deployment", "error"),
-            ("deployment", "metric_anomaly"),
-            ("configuration", "error")
-        ]
-        
-        if (type1, type2) in strong_patterns and time_diff < 300:
+        if STRONG_TABLE[type_id1][type_id2] and time_diff < 300:
             return "strong"
         
         return base_strength
@@ -318,42 +426,50 @@ class TimelineCorrelator:
         if len(events) < 2:
             return ["Insufficient timeline data"]
         
-        # Check for large time gaps between events
-        for i in range(len(events) - 1):
-            time_diff = self._calculate_time_diff(
-                events[i]["time"],
-                events[i + 1]["time"]
-            )
+        # Check for large time gaps between consecutive events, straight
+        # from the pre-parsed datetimes; events without one are skipped
+        prev, prev_dt = None, None
+        for curr in events:
+            curr_dt = curr.get("_dt")
+            
+            if prev_dt is not None and curr_dt is not None:
+                try:
+                    time_diff = abs((curr_dt - prev_dt).total_seconds())
+                except TypeError:
+                    # Naive and timezone-aware datetimes can't be compared
+                    time_diff = None
+                
+                if time_diff and time_diff > 600:  # > 10 minutes gap
+                    gaps.append(
+                        f"Large time gap ({int(time_diff/60)} minutes) between "
+                        f"{prev['time']} and {curr['time']}"
+                    )
             
-            if time_diff and time_diff > 600:  # > 10 minutes gap
-                gaps.append(
-                    f"Large time gap ({int(time_diff/60)} minutes) between "
-                    f"{events[i]['time']} and {events[i+1]['time']}"
-                )
+            prev, prev_dt = curr, curr_dt
         
         # Check for missing data sources
-        sources = set(event["source"] for event in events)
-        
-        if "image" not in sources:
-            gaps.append("No dashboard metrics provided")
+        missing = EXPECTED_SOURCES.keys() - {event["source"] for event in events}
         
-        if "log" not in sources:
-            gaps.append("No application logs provided")
-        
-        if "historical" not in sources:
-            gaps.append("No historical incident data available")
+        if missing:
+            gaps.extend(
+                message for source, message in EXPECTED_SOURCES.items()
+                if source in missing
+            )
         
         return gaps
 
 
 # Module-level convenience function
 _correlator_instance = None
+_correlator_lock = threading.Lock()
 
 def get_correlator() -> TimelineCorrelator:
-    """Get or create singleton correlator instance"""
+    """Get or create singleton correlator instance (thread-safe)"""
     global _correlator_instance
     if _correlator_instance is None:
-        _correlator_instance = TimelineCorrelator()
+        with _correlator_lock:
+            if _correlator_instance is None:
+                _correlator_instance = TimelineCorrelator()
     return _correlator_instance
 
 
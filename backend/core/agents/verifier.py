@@ -12,10 +12,125 @@ Key responsibilities:
 5. Recommend ANSWER/REFUSE/REQUEST_MORE_DATA
 """
 
-from typing import List, Dict, Tuple
-from dataclasses import dataclass
-from enum import Enum
+from typing import List, Dict, FrozenSet, Optional, Tuple
+from dataclasses import dataclass, replace
+from enum import Enum, IntEnum
+from collections import Counter, OrderedDict
+from datetime import datetime, time, timezone
+from functools import lru_cache
+import asyncio
+import hashlib
 import json
+import re
+import threading
+
+
+# Words too common to count as evidence of a hypothesis
+COMMON_WORDS = frozenset({'the', 'a', 'an', 'in', 'on', 'at', 'to', 'from', 'by'})
+
+_WORD_RE = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=1024)
+def _extract_key_terms(text: str) -> Tuple[str, ...]:
+    """
+    Extract important terms from hypothesis text.
+    
+    Cached on the text, since the same hypotheses are re-verified across runs.
+    """
+    return tuple(
+        w for w in text.lower().split()
+        if w not in COMMON_WORDS and len(w) > 3
+    )
+
+
+@lru_cache(maxsize=1024)
+def _key_term_weights(text: str) -> Tuple[Tuple[str, int], ...]:
+    """
+    Key terms of a hypothesis text as (term, occurrences) pairs, so each
+    distinct term is searched for only once per evidence item.
+    """
+    return tuple(Counter(_extract_key_terms(text)).items())
+
+
+@lru_cache(maxsize=1024)
+def _refutation_terms(would_refute: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Lowercased refutation terms, cached per hypothesis' term list."""
+    return tuple(refutation.lower() for refutation in would_refute)
+
+
+# Causal phrasings in hypothesis text, effect-first ones before cause-first
+# ones so "caused by" is not read as "caused". Only explicit causal phrases:
+# bare "from"/"after" are as often just description ("errors from the
+# payment service").
+_EFFECT_FIRST_RE = re.compile(
+    r"(?P<effect>.+?)\s+(?:caused by|triggered by|due to|because of|"
+    r"resulting from)\s+(?P<cause>.+)"
+)
+_CAUSE_FIRST_RE = re.compile(
+    r"(?P<cause>.+?)\s+(?:caused|causing|triggered|led to|leading to|"
+    r"resulted in|resulting in)\s+(?P<effect>.+)"
+)
+
+
+# Temporal words that can sit inside either side of a claim without naming
+# anything that would show up in the timeline
+_CAUSAL_STOP_WORDS = COMMON_WORDS | {'after', 'before', 'following', 'during'}
+
+
+def _phrase_terms(phrase: str) -> FrozenSet[str]:
+    """Key terms of one side of a causal claim, without punctuation."""
+    return frozenset(
+        w for w in _WORD_RE.findall(phrase)
+        if w not in _CAUSAL_STOP_WORDS and len(w) > 3
+    )
+
+
+@lru_cache(maxsize=1024)
+def _causal_claim(text: str) -> Optional[Tuple[FrozenSet[str], FrozenSet[str]]]:
+    """
+    (cause_terms, effect_terms) claimed by a hypothesis, e.g. "memory leak
+    caused by deployment" -> ({deployment}, {memory, leak}), or None when
+    the text makes no causal claim.
+    """
+    text = text.lower()
+    match = _EFFECT_FIRST_RE.search(text) or _CAUSE_FIRST_RE.search(text)
+    if match is None:
+        return None
+    
+    cause_terms = _phrase_terms(match.group("cause"))
+    effect_terms = _phrase_terms(match.group("effect"))
+    if not cause_terms or not effect_terms:
+        return None
+    return cause_terms, effect_terms
+
+
+@lru_cache(maxsize=4096)
+def _event_time(value: str) -> Optional[Tuple[bool, float]]:
+    """
+    Sortable form of a timeline event's time as (clock_only, seconds):
+    seconds since the epoch (naive times taken as UTC) for full timestamps,
+    or since midnight for bare clock times like "14:31:00Z". None if the
+    value can't be parsed.
+    """
+    try:
+        dt = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        pass
+    else:
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return False, dt.timestamp()
+    
+    try:
+        t = time.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    seconds = t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1e6
+    offset = t.utcoffset()
+    if offset is not None:
+        seconds -= offset.total_seconds()
+    return True, seconds
 
 
 class Verdict(Enum):
@@ -31,7 +146,27 @@ class EvidenceSource(Enum):
     RUNBOOK = "runbook"
 
 
-@dataclass
+class SourceIdx(IntEnum):
+    """Position of each source type in a per-hypothesis evidence tuple."""
+    IMAGE = 0
+    LOG = 1
+    HISTORICAL = 2
+    RUNBOOK = 3
+    RAG = 4
+    METRICS = 5
+    DASHBOARD = 6
+    PROMETHEUS = 7
+
+
+# Source type names, in SourceIdx order
+SOURCE_NAMES = tuple(idx.name.lower() for idx in SourceIdx)
+
+# Source type name -> index / bit, for tracking which sources produced support
+SRC_IDX = {name: int(idx) for name, idx in zip(SOURCE_NAMES, SourceIdx)}
+SOURCE_BIT = {name: 1 << idx for name, idx in SRC_IDX.items()}
+
+
+@dataclass(slots=True)
 class Evidence:
     source: str
     content: str
@@ -41,6 +176,42 @@ class Evidence:
 
 
 @dataclass
+class EvidenceColumns:
+    """One source type's evidence as parallel columns."""
+    contents: List[str]
+    contents_lower: List[str]
+    confidences: List[float]
+
+
+@dataclass
+class EvidenceBatch:
+    """
+    Evidence set in struct-of-arrays form, grouped by source type.
+    
+    The verifier scans the same contents for every hypothesis; holding them
+    (and their lowercased forms, computed once) in flat columns keeps those
+    scans to tight loops over lists of strings instead of attribute lookups
+    on Evidence objects.
+    """
+    columns: Dict[str, EvidenceColumns]
+    
+    @classmethod
+    def from_evidence(
+        cls,
+        evidence: Dict[str, List[Evidence]]
+    ) -> "EvidenceBatch":
+        columns = {}
+        for source_type, evidence_list in evidence.items():
+            contents = [ev.content for ev in evidence_list]
+            columns[source_type] = EvidenceColumns(
+                contents=contents,
+                contents_lower=[content.lower() for content in contents],
+                confidences=[ev.confidence for ev in evidence_list]
+            )
+        return cls(columns=columns)
+
+
+@dataclass(slots=True)
 class Hypothesis:
     id: str
     root_cause: str
@@ -50,7 +221,7 @@ class Hypothesis:
     would_refute: List[str]
 
 
-@dataclass
+@dataclass(slots=True)
 class VerificationResult:
     hypothesis_id: str
     verdict: Verdict
@@ -61,6 +232,29 @@ class VerificationResult:
     reasoning: str
 
 
+# Verification results of recent runs, for verifiers created with
+# cache_results=True. Keyed by the hypothesis and a fingerprint of the
+# evidence and timeline it was checked against.
+RESULT_CACHE_MAX_ENTRIES = 2048
+_result_cache: "OrderedDict[tuple, VerificationResult]" = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+
+def _copy_result(result: VerificationResult) -> VerificationResult:
+    """Copy of a result that shares no mutable lists with the original."""
+    return replace(
+        result,
+        evidence_summary={k: list(v) for k, v in result.evidence_summary.items()},
+        contradictions=list(result.contradictions)
+    )
+
+
+def clear_result_cache() -> None:
+    """Drop all cached verification results."""
+    with _result_cache_lock:
+        _result_cache.clear()
+
+
 class EvidenceVerifier:
     """
     Verifies hypotheses using strict evidence requirements.
@@ -72,14 +266,23 @@ class EvidenceVerifier:
     - <0.5:   Single source, conflicts, or major gaps → REFUSE
     """
     
-    def __init__(self, llm_client=None):
+    def __init__(
+        self,
+        llm_client=None,
+        cache_results: bool = False
+    ):
         """
         Args:
             llm_client: LLM for semantic matching (optional)
+            cache_results: Reuse results of earlier verifications of the same
+                hypothesis against identical evidence and timeline. The app's
+                verifiers turn this on; it is off by default so evaluation
+                runs stay independent when comparing changes.
         """
         self.llm = llm_client
         self.min_confidence_threshold = 0.7
         self.min_sources_for_high_confidence = 2
+        self.cache_results = cache_results
     
     def verify_hypotheses(
         self,
@@ -99,60 +302,158 @@ class EvidenceVerifier:
             (verification_results, overall_confidence)
         """
         results = {}
+        # Columnar once per call, so the matching steps don't lowercase the
+        # same content for every hypothesis and term
+        batch = EvidenceBatch.from_evidence(evidence)
+        
+        # Only hypotheses without a cached result need verifying
+        pending, cache_keys = self._lookup_cached(hypotheses, batch, timeline, results)
+        
+        # Serial on purpose: a hypothesis verifies in well under a millisecond,
+        # far less than shipping the batch and timeline to worker processes
+        verified = [
+            self._verify_single_hypothesis(hypothesis, batch, timeline)
+            for hypothesis in pending
+        ]
         
-        for hypothesis in hypotheses:
-            result = self._verify_single_hypothesis(
-                hypothesis,
-                evidence,
-                timeline
-            )
+        for hypothesis, result in zip(pending, verified):
             results[hypothesis.id] = result
+        self._store_cached(cache_keys, verified)
+        results = {hypothesis.id: results[hypothesis.id] for hypothesis in hypotheses}
         
         # Calculate overall confidence
         overall_confidence = self._calculate_overall_confidence(results)
         # print(results, overall_confidence)
         return results, overall_confidence
     
+    async def verify_hypotheses_async(
+        self,
+        hypotheses: List[Hypothesis],
+        evidence: Dict[str, List[Evidence]],
+        timeline: List[Dict]
+    ) -> Tuple[Dict[str, VerificationResult], float]:
+        """
+        Async variant of verify_hypotheses for use from async handlers.
+        
+        The whole verification runs in one worker thread, keeping the event
+        loop free. It isn't split per hypothesis: the matching is pure Python
+        and would serialize on the GIL anyway.
+        """
+        return await asyncio.to_thread(self.verify_hypotheses, hypotheses, evidence, timeline)
+    
+    def _lookup_cached(
+        self,
+        hypotheses: List[Hypothesis],
+        batch: EvidenceBatch,
+        timeline: List[Dict],
+        results: Dict[str, VerificationResult]
+    ) -> Tuple[List[Hypothesis], List[tuple]]:
+        """
+        Fill results with cached verifications when result caching is on.
+        
+        Returns the hypotheses still to verify and their cache keys (empty
+        when caching is off).
+        """
+        if not self.cache_results:
+            return list(hypotheses), []
+        
+        fingerprint = self._fingerprint(batch, timeline)
+        pending = []
+        cache_keys = []
+        with _result_cache_lock:
+            for hypothesis in hypotheses:
+                key = (
+                    hypothesis.id,
+                    hypothesis.root_cause,
+                    tuple(hypothesis.would_refute),
+                    fingerprint
+                )
+                cached = _result_cache.get(key)
+                if cached is None:
+                    pending.append(hypothesis)
+                    cache_keys.append(key)
+                else:
+                    _result_cache.move_to_end(key)
+                    results[hypothesis.id] = _copy_result(cached)
+        return pending, cache_keys
+    
+    @staticmethod
+    def _store_cached(
+        cache_keys: List[tuple],
+        verified: List[VerificationResult]
+    ) -> None:
+        """Cache freshly verified results under the keys from _lookup_cached."""
+        if not cache_keys:
+            return
+        with _result_cache_lock:
+            for key, result in zip(cache_keys, verified):
+                _result_cache[key] = _copy_result(result)
+                _result_cache.move_to_end(key)
+            while len(_result_cache) > RESULT_CACHE_MAX_ENTRIES:
+                _result_cache.popitem(last=False)
+    
+    def _fingerprint(self, batch: EvidenceBatch, timeline: List[Dict]) -> bytes:
+        """
+        Digest of everything besides the hypothesis that a result depends
+        on: evidence contents and confidences per source (in order, since
+        that orders the summary) and timeline times and texts.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for source_type, columns in batch.columns.items():
+            digest.update(b"\x00S" + source_type.encode())
+            for content, confidence in zip(columns.contents, columns.confidences):
+                digest.update(b"\x00C" + content.encode() + b"\x00" + repr(confidence).encode())
+        for event in timeline:
+            digest.update(
+                b"\x00T" + str(event.get("time")).encode()
+                + b"\x00" + str(event.get("event")).encode()
+            )
+        return digest.digest()
+    
     def _verify_single_hypothesis(
         self,
         hypothesis: Hypothesis,
-        evidence: Dict[str, List[Evidence]],
+        batch: EvidenceBatch,
         timeline: List[Dict]
     ) -> VerificationResult:
         """
         Verifies a single hypothesis against all available evidence.
         """
-        # Step 1: Collect supporting evidence from each source
-        evidence_summary = {
-            "image": [],
-            "log": [],
-            "historical": [],
-            "runbook": [],
-            "rag": [],          # ← ADD THESE
-            "metrics": [],      # ← ADD THESE
-            "dashboard": [],    # ← ADD THESE
-            "prometheus": [] 
-        }
-        
-        for source_type, evidence_list in evidence.items():
+        # Step 1: Collect supporting evidence from each source. The key terms
+        # are extracted once and shared by every source type.
+        # Matches are accumulated by SourceIdx position and only turned into
+        # the name-keyed summary once, for the result.
+        term_weights = _key_term_weights(hypothesis.root_cause)
+        matches_by_source = tuple([] for _ in SourceIdx)
+        
+        source_mask = 0
+        for source_type, columns in batch.columns.items():
             matching = self._find_supporting_evidence(
                 hypothesis,
-                evidence_list,
-                source_type
+                columns,
+                source_type,
+                term_weights
             )
-            evidence_summary[source_type].extend(matching)
+            if matching:
+                idx = SRC_IDX[source_type]
+                matches_by_source[idx].extend(matching)
+                source_mask |= 1 << idx
+        
+        evidence_summary = dict(zip(SOURCE_NAMES, matches_by_source))
         
         # Step 2: Count independent sources
-        independent_sources = sum(
-            1 for items in evidence_summary.values() if len(items) > 0
-        )
+        independent_sources = source_mask.bit_count()
         
-        # Step 3: Check for contradictions
-        contradictions = self._detect_contradictions(
-            hypothesis,
-            evidence,
-            timeline
-        )
+        # Step 3: Check for contradictions. Most hypotheses have none, so
+        # check for any first and only list them all when there are some.
+        if self._has_contradiction(hypothesis, batch, timeline):
+            contradictions = self._detect_contradictions(
+                hypothesis,
+                batch,
+                timeline
+            )
+        else:
+            contradictions = []
         
         # Step 4: Verify timeline consistency
         timeline_consistent = self._check_timeline_consistency(
@@ -166,7 +467,8 @@ class EvidenceVerifier:
             independent_sources=independent_sources,
             has_contradictions=len(contradictions) > 0,
             timeline_consistent=timeline_consistent,
-            evidence_summary=evidence_summary
+            evidence_summary=evidence_summary,
+            source_mask=source_mask
         )
         
         # Step 6: Determine verdict
@@ -199,42 +501,47 @@ class EvidenceVerifier:
     def _find_supporting_evidence(
         self,
         hypothesis: Hypothesis,
-        evidence_list: List[Evidence],
-        source_type: str
+        columns: EvidenceColumns,
+        source_type: str,
+        term_weights: Optional[Tuple[Tuple[str, int], ...]] = None
     ) -> List[str]:
         """
         Finds evidence that supports the hypothesis.
         Uses both keyword matching and semantic similarity.
+        
+        term_weights is the hypothesis' key terms as built by
+        _key_term_weights; it is derived from the hypothesis when omitted.
         """
         supporting = []
         
         # Extract key terms from hypothesis
-        key_terms = self._extract_key_terms(hypothesis.root_cause)
-        
-        for ev in evidence_list:
-            # Simple keyword matching (can be enhanced with embeddings)
-            content_lower = ev.content.lower()
-            matches = sum(1 for term in key_terms if term in content_lower)
+        if term_weights is None:
+            term_weights = _key_term_weights(hypothesis.root_cause)
+        
+        for content, haystack, confidence in zip(
+            columns.contents, columns.contents_lower, columns.confidences
+        ):
+            # Simple keyword matching (can be enhanced with embeddings).
+            # A repeated term counts once per occurrence in the hypothesis.
+            # Only the threshold matters, so stop counting once it is reached.
+            matches = 0
+            for term, weight in term_weights:
+                if term in haystack:
+                    matches += weight
+                    if matches >= 2:
+                        break
             
             if matches >= 2:  # At least 2 key terms match
                 supporting.append(
-                    f"{ev.content} (confidence: {ev.confidence:.2f})"
+                    f"{content} (confidence: {confidence:.2f})"
                 )
         
         return supporting
     
-    def _extract_key_terms(self, text: str) -> List[str]:
-        """Extract important terms from hypothesis text."""
-        # Remove common words and extract key terms
-        common_words = {'the', 'a', 'an', 'in', 'on', 'at', 'to', 'from', 'by'}
-        words = text.lower().split()
-        key_terms = [w for w in words if w not in common_words and len(w) > 3]
-        return key_terms
-    
     def _detect_contradictions(
         self,
         hypothesis: Hypothesis,
-        evidence: Dict[str, List[Evidence]],
+        batch: EvidenceBatch,
         timeline: List[Dict]
     ) -> List[str]:
         """
@@ -243,15 +550,18 @@ class EvidenceVerifier:
         contradictions = []
         
         # Check if any evidence explicitly refutes the hypothesis
-        refutation_terms = hypothesis.would_refute
-        
-        for source_type, evidence_list in evidence.items():
-            for ev in evidence_list:
-                for refutation in refutation_terms:
-                    if refutation.lower() in ev.content.lower():
-                        contradictions.append(
-                            f"[{source_type}] {ev.content}"
-                        )
+        refutation_terms = _refutation_terms(tuple(hypothesis.would_refute))
+        
+        if refutation_terms:
+            for source_type, columns in batch.columns.items():
+                for content, content_lower in zip(columns.contents, columns.contents_lower):
+                    for refutation in refutation_terms:
+                        if refutation in content_lower:
+                            contradictions.append(
+                                f"[{source_type}] {content}"
+                            )
+                            # One entry per refuting evidence item
+                            break
         
         # Check timeline contradictions
         # (e.g., if hypothesis claims X caused Y, but Y happened before X)
@@ -263,6 +573,27 @@ class EvidenceVerifier:
         
         return contradictions
     
+    def _has_contradiction(
+        self,
+        hypothesis: Hypothesis,
+        batch: EvidenceBatch,
+        timeline: List[Dict]
+    ) -> bool:
+        """
+        Whether _detect_contradictions would find anything, stopping at the
+        first refuting evidence item.
+        """
+        refutation_terms = _refutation_terms(tuple(hypothesis.would_refute))
+        
+        if refutation_terms:
+            for columns in batch.columns.values():
+                for content_lower in columns.contents_lower:
+                    for refutation in refutation_terms:
+                        if refutation in content_lower:
+                            return True
+        
+        return bool(self._check_temporal_contradictions(hypothesis, timeline))
+    
     def _check_temporal_contradictions(
         self,
         hypothesis: Hypothesis,
@@ -289,18 +620,45 @@ class EvidenceVerifier:
     ) -> bool:
         """
         Verifies that evidence aligns temporally with hypothesis.
+        
+        When the hypothesis makes a causal claim ("X caused Y", "Y due to X",
+        ...) and the timeline has timestamped events for both sides, the
+        claim holds only if the cause's first event is no later than the
+        effect's. Otherwise this falls back to requiring at least two
+        timeline events.
         """
         # If we have no timeline, we can't verify consistency
         if not timeline:
             return False
         
-        # Check if all pieces of evidence appear in timeline
-        # and are in logical causal order
-        
-        # This is simplified - production version would do proper
-        # temporal reasoning
-        
-        # For now, just check we have timeline events
+        claim = _causal_claim(hypothesis.root_cause)
+        if claim is not None:
+            cause_terms, effect_terms = claim
+            first_cause = first_effect = None
+            
+            for event in timeline:
+                when = _event_time(event.get("time"))
+                if when is None:
+                    continue
+                
+                words = _WORD_RE.findall(str(event.get("event", "")).lower())
+                if not words:
+                    continue
+                if first_cause is None or when < first_cause:
+                    if not cause_terms.isdisjoint(words):
+                        first_cause = when
+                if first_effect is None or when < first_effect:
+                    if not effect_terms.isdisjoint(words):
+                        first_effect = when
+            
+            # Only comparable when both sides are the same kind of time
+            if (
+                first_cause is not None and first_effect is not None
+                and first_cause[0] == first_effect[0]
+            ):
+                return first_cause[1] <= first_effect[1]
+        
+        # No checkable claim: just check we have timeline events
         return len(timeline) >= 2
     
     def _calculate_hypothesis_confidence(
@@ -308,7 +666,8 @@ class EvidenceVerifier:
         independent_sources: int,
         has_contradictions: bool,
         timeline_consistent: bool,
-        evidence_summary: Dict[str, List[str]]
+        evidence_summary: Dict[str, List[str]],
+        source_mask: Optional[int] = None
     ) -> float:
         """
         Calculates confidence score for a hypothesis.
@@ -317,7 +676,16 @@ class EvidenceVerifier:
         - Base score from number of independent sources
         - Penalties for contradictions or timeline issues
         - Bonuses for high-quality evidence
+        
+        source_mask is the SOURCE_BIT set of sources with supporting
+        evidence; it is derived from evidence_summary when omitted.
         """
+        if source_mask is None:
+            source_mask = 0
+            for source_type, items in evidence_summary.items():
+                if items:
+                    source_mask |= SOURCE_BIT.get(source_type, 0)
+        
         # Base score from number of sources
         if independent_sources >= 3:
             base_score = 0.85
@@ -337,11 +705,11 @@ class EvidenceVerifier:
         
         # Bonuses
         # If we have historical incident match, boost confidence
-        if len(evidence_summary.get("historical", [])) > 0:
+        if source_mask & SOURCE_BIT["historical"]:
             base_score += 0.10
         
         # If we have high-confidence image evidence
-        if len(evidence_summary.get("image", [])) > 0:
+        if source_mask & SOURCE_BIT["image"]:
             base_score += 0.05
         
         # Clamp to [0, 1]
@@ -413,18 +781,22 @@ class EvidenceVerifier:
         if not results:
             return 0.0
         
-        # Find the highest confidence SUPPORTED hypothesis
-        supported = [
-            r.confidence for r in results.values()
-            if r.verdict == Verdict.SUPPORTED
-        ]
+        # Highest confidence among SUPPORTED hypotheses and among all of
+        # them, in one pass (confidences are clamped to [0, 1])
+        best_supported = -1.0
+        best_any = 0.0
+        for r in results.values():
+            if r.confidence > best_any:
+                best_any = r.confidence
+            if r.verdict == Verdict.SUPPORTED and r.confidence > best_supported:
+                best_supported = r.confidence
         
-        if supported:
-            return max(supported)
+        if best_supported >= 0:
+            return best_supported
         
         # If no hypotheses are supported, return max confidence among all
         # (but this will be low and should trigger refusal)
-        return max(r.confidence for r in results.values())
+        return best_any
 
 
 # Usage example
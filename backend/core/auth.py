@@ -3,10 +3,16 @@ Authentication and authorization utilities.
 JWT token generation, validation, and password hashing.
 """
 
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 
-from jose import JWTError, jwt
+import jwt
+from anyio import to_thread
 from pwdlib import PasswordHash
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -25,9 +31,23 @@ SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production-u
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", "10080"))  # 7 days default
 
+# Verify passwords in worker processes rather than threads, so concurrent
+# logins can use every core even where hashing holds the GIL
+AUTH_USE_PROCESS_POOL = os.getenv("AUTH_USE_PROCESS_POOL", "false").lower() in ("true", "1", "yes")
+_password_pool: Optional[ProcessPoolExecutor] = None
+_password_pool_lock = threading.Lock()
+
 # HTTP Bearer token
 security = HTTPBearer()
 
+# Decoded payloads of recently seen tokens, keyed by the raw token. A token's
+# payload can't change, so an entry is valid until the sooner of the TTL and
+# the token's own expiry; invalid tokens are never cached.
+TOKEN_CACHE_TTL_SECONDS = 60
+TOKEN_CACHE_MAX_ENTRIES = 10_000
+_token_cache: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+_token_cache_lock = threading.Lock()
+
 
 
 
@@ -35,10 +55,9 @@ security = HTTPBearer()
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify a password against its hash.
-    Uses pwdlib (Argon2id by default via recommended()) and enforces ASCII-only passwords.
+    Uses pwdlib (Argon2id by default via recommended()). Any Unicode
+    password is accepted; it is hashed as UTF-8 in full.
     """
-    print(f"Verifying password: {plain_password} against hash: {hashed_password}")
-
     try:
         return password_hasher.verify(plain_password, hashed_password)
     except Exception:
@@ -52,6 +71,51 @@ def get_password_hash(password: str) -> str:
     return password_hasher.hash(password)
 
 
+def _get_password_pool() -> ProcessPoolExecutor:
+    """Process pool for password verification, created on first use."""
+    global _password_pool
+    if _password_pool is None:
+        with _password_pool_lock:
+            if _password_pool is None:
+                _password_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+    return _password_pool
+
+
+def shutdown_password_pool() -> None:
+    """Stop the password process pool's workers (call on app shutdown)."""
+    global _password_pool
+    with _password_pool_lock:
+        pool, _password_pool = _password_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+async def verify_password_pp(plain_password: str, hashed_password: str) -> bool:
+    """verify_password in the password process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_password_pool(), verify_password, plain_password, hashed_password
+    )
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    verify_password in a worker thread (or process, with
+    AUTH_USE_PROCESS_POOL), so the Argon2 work doesn't block the event loop.
+    """
+    if AUTH_USE_PROCESS_POOL:
+        return await verify_password_pp(plain_password, hashed_password)
+    return await to_thread.run_sync(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    get_password_hash in a worker thread, so the Argon2 work doesn't block
+    the event loop.
+    """
+    return await to_thread.run_sync(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -66,12 +130,35 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 
 def decode_access_token(token: str) -> Optional[dict]:
-    """Decode and validate a JWT token"""
+    """Decode and validate a JWT token (cached briefly per token)"""
+    now = time.time()
+    
+    with _token_cache_lock:
+        cached = _token_cache.get(token)
+        if cached is not None:
+            valid_until, payload = cached
+            if valid_until > now:
+                _token_cache.move_to_end(token)
+                return dict(payload)
+            del _token_cache[token]
+    
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
+    except jwt.PyJWTError:
         return None
+    
+    valid_until = now + TOKEN_CACHE_TTL_SECONDS
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        valid_until = min(valid_until, exp)
+    
+    with _token_cache_lock:
+        _token_cache[token] = (valid_until, dict(payload))
+        _token_cache.move_to_end(token)
+        while len(_token_cache) > TOKEN_CACHE_MAX_ENTRIES:
+            _token_cache.popitem(last=False)
+    
+    return payload
 
 
 async def get_current_user(
@@ -131,7 +218,17 @@ async def get_optional_user(
     if credentials is None:
         return None
     
-    try:
-        return await get_current_user(credentials, db)
-    except HTTPException:
+    # Same checks as get_current_user, but a failed one just means anonymous
+    payload = decode_access_token(credentials.credentials)
+    if payload is None:
         return None
+    
+    user_id = payload.get("sub")
+    if user_id is None:
+        return None
+    
+    user = await get_user_by_id(db, user_id)
+    if user is None or not user.is_active:
+        return None
+    
+    return user
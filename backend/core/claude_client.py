@@ -1,14 +1,25 @@
 # claude_client.py
 import asyncio
-from typing import Dict, Any, List, Optional
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
 from anthropic import Anthropic, AsyncAnthropic
 from mcp import ClientSession, StdioServerParameters
-import json
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Add parent to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.jsonutil import json_dumps
+
+# Marks the end of a prompt prefix for Anthropic prompt caching; everything
+# up to and including the marked block is reused across calls
+CACHE_CONTROL = {"type": "ephemeral"}
+PROMPT_CACHING_HEADERS = {"anthropic-beta": "prompt-caching-2024-07-31"}
+
 class DevOpsClaudeClient:
     """Claude SDK client with MCP server integration"""
     
@@ -17,6 +28,10 @@ class DevOpsClaudeClient:
         self.anthropic = AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
         self.sessions: Dict[str, ClientSession] = {}
         self.available_tools: List[Dict] = []
+        # Prefixed tool name -> (server name, tool name on that server)
+        self._tool_lookup: Dict[str, Tuple[str, str]] = {}
+        # available_tools in API form; rebuilt only after _refresh_tools
+        self._formatted_tools_cache: Optional[List[Dict]] = None
         
     async def start_mcp_server(self, name: str, command: List[str]):
         """Start an MCP server and connect to it"""
@@ -38,6 +53,7 @@ class DevOpsClaudeClient:
     async def _refresh_tools(self):
         """Collect all tools from all connected MCP servers"""
         self.available_tools = []
+        self._tool_lookup = {}
         
         for name, session in self.sessions.items():
             try:
@@ -48,97 +64,232 @@ class DevOpsClaudeClient:
                     tool_dict["name"] = f"{name}_{tool.name}"
                     tool_dict["server"] = name
                     self.available_tools.append(tool_dict)
+                    self._tool_lookup[tool_dict["name"]] = (name, tool.name)
             except Exception as e:
                 print(f"Failed to get tools from {name}: {e}")
+        
+        self._formatted_tools_cache = None
     
     def _format_tools_for_claude(self) -> List[Dict]:
-        """Format MCP tools for Claude API"""
-        formatted = []
-        for tool in self.available_tools:
-            formatted.append({
+        """
+        Format MCP tools for Claude API.
+        
+        The last tool carries the cache breakpoint, so the whole tool list
+        is cached as one prefix. Built once per tool refresh.
+        """
+        if self._formatted_tools_cache is not None:
+            return self._formatted_tools_cache
+        
+        formatted = [
+            {
                 "name": tool["name"],
                 "description": tool.get("description", ""),
                 "input_schema": tool.get("inputSchema", {})
-            })
+            }
+            for tool in self.available_tools
+        ]
+        if formatted:
+            formatted[-1]["cache_control"] = CACHE_CONTROL
+        
+        self._formatted_tools_cache = formatted
         return formatted
     
-    async def analyze_with_tools(self, 
-                                 prompt: str, 
-                                 max_steps: int = 5,
-                                 temperature: float = 0.2) -> Dict[str, Any]:
+    async def _run_tool(self, tool_name: str, tool_input: Dict) -> Optional[Dict[str, Any]]:
         """
-        Main analysis loop: Claude uses MCP tools to analyze DevOps issues
+        Execute one tool_use block via MCP.
+        
+        Returns its step entry ("tool_result" or "error"), or None when no
+        connected server provides the tool.
+        """
+        target = self._tool_lookup.get(tool_name)
+        if target is not None:
+            server_name, actual_tool_name = target
+        else:
+            # Not (yet) in the registry: fall back to the "<server>_<tool>" prefix
+            server_name, _, actual_tool_name = tool_name.partition("_")
+        
+        if server_name not in self.sessions:
+            return None
+        
+        try:
+            # Call the tool via MCP
+            tool_result = await self.sessions[server_name].call_tool(
+                actual_tool_name,
+                tool_input
+            )
+        except Exception as e:
+            return {"type": "error", "error": f"Tool {tool_name} failed: {str(e)}"}
+        
+        return {"type": "tool_result", "tool": tool_name, "result": tool_result}
+    
+    @staticmethod
+    def _tool_result_block(tool_use_id: str, tool_name: str,
+                           entry: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """tool_result content block reporting a _run_tool entry back to Claude."""
+        block = {"type": "tool_result", "tool_use_id": tool_use_id}
+        if entry is None:
+            block.update(content=f"Tool {tool_name} is not available", is_error=True)
+        elif entry["type"] == "error":
+            block.update(content=entry["error"], is_error=True)
+        else:
+            result = entry["result"]
+            content = getattr(result, "content", None)
+            if isinstance(content, list):
+                # MCP content blocks: forward text as is, anything else as JSON
+                block["content"] = [
+                    {"type": "text", "text": item.text}
+                    if getattr(item, "type", None) == "text" else
+                    {"type": "text", "text": json_dumps(
+                        item.model_dump() if hasattr(item, "model_dump") else item
+                    )}
+                    for item in content
+                ]
+                if getattr(result, "isError", False):
+                    block["is_error"] = True
+            else:
+                block["content"] = result if isinstance(result, str) else json_dumps(result)
+        return block
+    
+    async def stream_analysis_with_tools(self,
+                                         prompt: str,
+                                         max_steps: int = 5,
+                                         temperature: float = 0.2,
+                                         system: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming form of analyze_with_tools.
+        
+        Yields {"type": "text_delta", "text": ...} as Claude writes, each
+        step entry ("analysis", "tool_result" or "error") as soon as it is
+        complete, and finally {"type": "done", "result": ...} holding what
+        analyze_with_tools returns. Each tool starts as soon as its tool_use
+        block has streamed in, and all tools of a response run concurrently.
         """
         messages = [{"role": "user", "content": prompt}]
         step = 0
         results = []
         
+        # Request arguments that stay the same for every step
+        base_kwargs = {
+            "model": self.model,
+            "max_tokens": 4000,
+            "temperature": temperature,
+            "tools": self._format_tools_for_claude(),
+            "extra_headers": PROMPT_CACHING_HEADERS,
+        }
+        if system:
+            base_kwargs["system"] = [
+                {"type": "text", "text": system, "cache_control": CACHE_CONTROL}
+            ]
+        
         while step < max_steps:
-            # Get Claude's response with tool suggestions
-            response = await self.anthropic.messages.create(
-                model=self.model,
-                max_tokens=4000,
-                temperature=temperature,
-                tools=self._format_tools_for_claude(),
-                messages=messages
-            )
+            # Completed blocks in order: text entries, or the running task
+            # of each tool call
+            blocks = []
+            try:
+                # Get Claude's response with tool suggestions
+                async with self.anthropic.messages.stream(
+                    **base_kwargs,
+                    messages=messages
+                ) as stream:
+                    async for event in stream:
+                        if event.type == "content_block_delta":
+                            if event.delta.type == "text_delta":
+                                yield {"type": "text_delta", "text": event.delta.text}
+                            continue
+                        
+                        if event.type != "content_block_stop":
+                            continue
+                        
+                        content = event.content_block
+                        if content.type == "text":
+                            entry = {"type": "analysis", "text": content.text}
+                            blocks.append(entry)
+                            yield entry
+                        
+                        elif content.type == "tool_use":
+                            # Start the tool now; tool calls are I/O-bound, so
+                            # all of a response's calls run concurrently
+                            blocks.append((
+                                content.id,
+                                content.name,
+                                asyncio.create_task(self._run_tool(content.name, content.input))
+                            ))
+                    
+                    response = await stream.get_final_message()
+                
+                tool_calls = [block for block in blocks if isinstance(block, tuple)]
+                outcomes = iter(await asyncio.gather(
+                    *(task for _, _, task in tool_calls),
+                    return_exceptions=True
+                ))
+            except BaseException:
+                # The stream failed (or the caller stopped iterating) before
+                # the tools were collected; don't leave them running
+                for block in blocks:
+                    if isinstance(block, tuple):
+                        block[2].cancel()
+                raise
+            
+            # The assistant turn goes back as is, so each tool_result can
+            # refer to its tool_use block
+            messages.append({"role": "assistant", "content": response.content})
+            tool_results = []
             
-            # Extract content
-            for content in response.content:
-                if content.type == "text":
-                    results.append({"type": "analysis", "text": content.text})
-                    messages.append({
-                        "role": "assistant", 
-                        "content": content.text
-                    })
+            # Record everything in block order
+            for block in blocks:
+                if not isinstance(block, tuple):
+                    results.append(block)
+                    continue
                 
-                elif content.type == "tool_use":
-                    # Execute the tool
-                    tool_name = content.name
-                    server_name = tool_name.split("_")[0]
-                    actual_tool_name = "_".join(tool_name.split("_")[1:])
-                    
-                    if server_name in self.sessions:
-                        try:
-                            # Call the tool via MCP
-                            tool_result = await self.sessions[server_name].call_tool(
-                                actual_tool_name,
-                                content.input
-                            )
-                            
-                            # Add result to conversation
-                            result_text = f"Tool {tool_name} result:\n{tool_result}"
-                            results.append({
-                                "type": "tool_result", 
-                                "tool": tool_name,
-                                "result": tool_result
-                            })
-                            
-                            messages.append({
-                                "role": "user",
-                                "content": result_text
-                            })
-                            
-                        except Exception as e:
-                            error_msg = f"Tool {tool_name} failed: {str(e)}"
-                            results.append({"type": "error", "error": error_msg})
-                            messages.append({
-                                "role": "user", 
-                                "content": error_msg
-                            })
+                tool_use_id, tool_name, _ = block
+                entry = next(outcomes)
+                if isinstance(entry, BaseException):
+                    entry = {"type": "error", "error": f"Tool {tool_name} failed: {str(entry)}"}
+                tool_results.append(self._tool_result_block(tool_use_id, tool_name, entry))
+                if entry is not None:
+                    results.append(entry)
+                    yield entry
+            
+            if tool_results:
+                messages.append({"role": "user", "content": tool_results})
             
             step += 1
             
             # Check if Claude is done
-            if not any(content.type == "tool_use" for content in response.content):
+            if response.stop_reason != "tool_use":
                 break
         
-        return {
-            "final_analysis": response.content[-1].text if response.content else "",
-            "steps": results,
-            "tools_used": len([r for r in results if r["type"] == "tool_result"])
+        yield {
+            "type": "done",
+            "result": {
+                # The last block is not necessarily text (e.g. at max_steps)
+                "final_analysis": next(
+                    (c.text for c in reversed(response.content) if c.type == "text"), ""
+                ),
+                "steps": results,
+                "tools_used": len([r for r in results if r["type"] == "tool_result"])
+            }
         }
     
+    async def analyze_with_tools(self, 
+                                 prompt: str, 
+                                 max_steps: int = 5,
+                                 temperature: float = 0.2,
+                                 system: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Main analysis loop: Claude uses MCP tools to analyze DevOps issues
+        
+        Static instructions belong in system rather than prompt: together
+        with the tool schemas they form a cached prefix, so each step of the
+        loop only pays full price for the conversation so far. Use
+        stream_analysis_with_tools to see progress while it runs.
+        """
+        async for event in self.stream_analysis_with_tools(
+            prompt, max_steps, temperature, system
+        ):
+            if event["type"] == "done":
+                return event["result"]
+    
     async def close(self):
         """Cleanup all MCP sessions"""
         for name, session in self.sessions.items():
@@ -0,0 +1,100 @@
+"""
+Background writer for audit logs.
+
+Audit entries are fire-and-forget, so instead of a commit per entry inside
+the request, create_audit_log queues them here and a background task
+inserts them in batches.
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .models import AuditLog
+
+# Flush when this many entries are queued, or this long after the first one
+AUDIT_BATCH_SIZE = 100
+AUDIT_FLUSH_INTERVAL = 0.5  # seconds
+
+_audit_queue: Optional[asyncio.Queue] = None
+_flush_task: Optional[asyncio.Task] = None
+
+
+def audit_writer_running() -> bool:
+    """Whether queued audit entries are being written."""
+    return _flush_task is not None and not _flush_task.done()
+
+
+def enqueue_audit_log(entry: Dict[str, Any]) -> bool:
+    """
+    Queue an audit_logs row (column -> value) for the background writer.
+    Returns False if the writer isn't running.
+    """
+    if not audit_writer_running():
+        return False
+    _audit_queue.put_nowait(entry)
+    return True
+
+
+async def _write_batch(batch: List[Dict[str, Any]]) -> None:
+    """Insert a batch of audit rows in one statement."""
+    from .session import AsyncSessionLocal
+
+    try:
+        async with AsyncSessionLocal() as session:
+            await session.execute(pg_insert(AuditLog).values(batch))
+            await session.commit()
+    except Exception as e:
+        print(f"⚠️  Failed to write {len(batch)} audit log(s): {e}")
+
+
+async def _flush_audit_logs() -> None:
+    """Consume the queue, writing up to AUDIT_BATCH_SIZE entries at a time."""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _audit_queue.get()]
+        deadline = loop.time() + AUDIT_FLUSH_INTERVAL
+
+        try:
+            while len(batch) < AUDIT_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(_audit_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        finally:
+            # Also reached on cancellation, so a stopping writer still
+            # saves what it already took off the queue
+            await asyncio.shield(_write_batch(batch))
+
+
+def start_audit_writer() -> None:
+    """Start the background writer (call once the event loop is running)."""
+    global _audit_queue, _flush_task
+    if audit_writer_running():
+        return
+    _audit_queue = asyncio.Queue()
+    _flush_task = asyncio.create_task(_flush_audit_logs())
+
+
+async def stop_audit_writer() -> None:
+    """Stop the background writer, writing out anything still queued."""
+    global _flush_task
+    if _flush_task is None:
+        return
+
+    task, _flush_task = _flush_task, None
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+    remaining = []
+    while not _audit_queue.empty():
+        remaining.append(_audit_queue.get_nowait())
+    for start in range(0, len(remaining), AUDIT_BATCH_SIZE):
+        await _write_batch(remaining[start:start + AUDIT_BATCH_SIZE])
@@ -3,14 +3,22 @@ CRUD operations for database models.
 """
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, and_, desc
+from sqlalchemy import select, update, delete, and_, desc, func, lambda_stmt, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import selectinload
-from typing import Optional, List, Dict, Any
-from datetime import datetime
-import json
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime, timezone
+import uuid
 
+from core.jsonutil import json_dumps, json_loads
+
+from .audit import enqueue_audit_log
 from .models import User, UserSetting, Analysis, AuditLog
 
+# Point lookups below are built with lambda_stmt: SQLAlchemy caches the
+# compiled statement per lambda and only re-binds the captured values.
+
+
 
 # ============================================================================
 # User CRUD
@@ -18,13 +26,13 @@ from .models import User, UserSetting, Analysis, AuditLog
 
 async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     """Get user by email"""
-    result = await db.execute(select(User).where(User.email == email))
+    result = await db.execute(lambda_stmt(lambda: select(User).where(User.email == email)))
     return result.scalar_one_or_none()
 
 
 async def get_user_by_id(db: AsyncSession, user_id: str) -> Optional[User]:
     """Get user by ID"""
-    result = await db.execute(select(User).where(User.id == user_id))
+    result = await db.execute(lambda_stmt(lambda: select(User).where(User.id == user_id)))
     return result.scalar_one_or_none()
 
 
@@ -44,7 +52,6 @@ async def create_user(
     )
     db.add(user)
     await db.commit()
-    await db.refresh(user)
     return user
 
 
@@ -52,40 +59,60 @@ async def create_user(
 # User Settings CRUD
 # ============================================================================
 
+def _cast_setting_value(value: Optional[str], value_type: str) -> Any:
+    """Cast a stored setting string to its value_type"""
+    if value_type == "int":
+        return int(value) if value else 0
+    elif value_type == "float":
+        return float(value) if value else 0.0
+    elif value_type == "bool":
+        return value.lower() in ("true", "1", "yes") if value else False
+    elif value_type == "json":
+        return json_loads(value) if value else {}
+    else:  # string, path
+        return value or ""
+
+
+def _setting_storage_values(value: Any, value_type: str) -> Tuple[str, Any]:
+    """A setting's stored forms: (value string, value cast for value_json)"""
+    if value_type == "json":
+        value_str = json_dumps(value) if value else "{}"
+    else:
+        value_str = str(value) if value is not None else ""
+    
+    # Typed copy, cast once here instead of on every read
+    return value_str, _cast_setting_value(value_str, value_type)
+
+
 async def get_user_settings(db: AsyncSession, user_id: str) -> Dict[str, Any]:
     """
     Get all settings for a user as a dictionary.
     Returns: { "KEY": value, ... }
     """
     result = await db.execute(
-        select(UserSetting).where(UserSetting.user_id == user_id)
+        select(
+            UserSetting.key,
+            UserSetting.value_json,
+            UserSetting.value,
+            UserSetting.value_type
+        ).where(UserSetting.user_id == user_id)
     )
-    settings = result.scalars().all()
     
-    # Convert to dict, casting values by type
-    settings_dict = {}
-    for s in settings:
-        if s.value_type == "int":
-            settings_dict[s.key] = int(s.value) if s.value else 0
-        elif s.value_type == "float":
-            settings_dict[s.key] = float(s.value) if s.value else 0.0
-        elif s.value_type == "bool":
-            settings_dict[s.key] = s.value.lower() in ("true", "1", "yes") if s.value else False
-        elif s.value_type == "json":
-            settings_dict[s.key] = json.loads(s.value) if s.value else {}
-        else:  # string, path
-            settings_dict[s.key] = s.value or ""
-    
-    return settings_dict
+    # value_json comes back already typed; only rows written before it
+    # existed need casting here
+    return {
+        key: value_json if value_json is not None else _cast_setting_value(value, value_type)
+        for key, value_json, value, value_type in result.all()
+    }
 
 
 async def get_user_setting(db: AsyncSession, user_id: str, key: str) -> Optional[UserSetting]:
     """Get a specific setting for a user"""
-    result = await db.execute(
-        select(UserSetting).where(
+    result = await db.execute(lambda_stmt(
+        lambda: select(UserSetting).where(
             and_(UserSetting.user_id == user_id, UserSetting.key == key)
         )
-    )
+    ))
     return result.scalar_one_or_none()
 
 
@@ -98,34 +125,72 @@ async def update_user_setting(
 ) -> UserSetting:
     """
     Update or create a user setting.
+    
+    A single INSERT ... ON CONFLICT DO UPDATE, so concurrent updates of the
+    same key can't race into a duplicate insert.
     """
-    # Try to get existing
-    existing = await get_user_setting(db, user_id, key)
+    # Convert value to string (and typed JSON) for storage
+    value_str, value_json = _setting_storage_values(value, value_type)
     
-    # Convert value to string for storage
-    if value_type == "json":
-        value_str = json.dumps(value) if value else "{}"
-    else:
-        value_str = str(value) if value is not None else ""
+    stmt = pg_insert(UserSetting).values(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        key=key,
+        value=value_str,
+        value_type=value_type,
+        value_json=value_json
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "key"],
+        set_={
+            "value": stmt.excluded.value,
+            "value_type": stmt.excluded.value_type,
+            "value_json": stmt.excluded.value_json,
+            "updated_at": func.now(),
+        }
+    ).returning(UserSetting)
     
-    if existing:
-        existing.value = value_str
-        existing.value_type = value_type
-        existing.updated_at = datetime.utcnow()
-        await db.commit()
-        await db.refresh(existing)
-        return existing
-    else:
-        new_setting = UserSetting(
-            user_id=user_id,
-            key=key,
-            value=value_str,
-            value_type=value_type
-        )
-        db.add(new_setting)
-        await db.commit()
-        await db.refresh(new_setting)
-        return new_setting
+    setting = await db.scalar(stmt, execution_options={"populate_existing": True})
+    await db.commit()
+    return setting
+
+
+async def upsert_user_settings(
+    db: AsyncSession,
+    user_id: str,
+    settings: Dict[str, Tuple[Any, str]]
+) -> None:
+    """
+    Create or update several settings for a user in one statement.
+    settings maps key -> (value, value_type).
+    """
+    if not settings:
+        return
+    
+    rows = []
+    for key, (value, value_type) in settings.items():
+        value_str, value_json = _setting_storage_values(value, value_type)
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "key": key,
+            "value": value_str,
+            "value_type": value_type,
+            "value_json": value_json,
+        })
+    
+    stmt = pg_insert(UserSetting).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "key"],
+        set_={
+            "value": stmt.excluded.value,
+            "value_type": stmt.excluded.value_type,
+            "value_json": stmt.excluded.value_json,
+            "updated_at": func.now(),
+        }
+    )
+    await db.execute(stmt)
+    await db.commit()
 
 
 async def delete_user_setting(db: AsyncSession, user_id: str, key: str) -> bool:
@@ -143,6 +208,17 @@ async def delete_user_setting(db: AsyncSession, user_id: str, key: str) -> bool:
 # Analysis CRUD
 # ============================================================================
 
+# Columns shown in analysis lists
+ANALYSIS_SUMMARY_COLUMNS = (
+    Analysis.id,
+    Analysis.analysis_id,
+    Analysis.status,
+    Analysis.confidence,
+    Analysis.root_cause,
+    Analysis.processing_time_ms,
+    Analysis.created_at,
+)
+
 async def create_analysis(
     db: AsyncSession,
     analysis_id: str,
@@ -163,21 +239,20 @@ async def create_analysis(
     )
     db.add(analysis)
     await db.commit()
-    await db.refresh(analysis)
     return analysis
 
 
 async def get_analysis_by_id(db: AsyncSession, analysis_id: str) -> Optional[Analysis]:
     """Get analysis by analysis_id (e.g., 'analysis_1234567890')"""
-    result = await db.execute(
-        select(Analysis).where(Analysis.analysis_id == analysis_id)
-    )
+    result = await db.execute(lambda_stmt(
+        lambda: select(Analysis).where(Analysis.analysis_id == analysis_id)
+    ))
     return result.scalar_one_or_none()
 
 
 async def get_analysis_by_db_id(db: AsyncSession, db_id: str) -> Optional[Analysis]:
     """Get analysis by database ID (UUID)"""
-    result = await db.execute(select(Analysis).where(Analysis.id == db_id))
+    result = await db.execute(lambda_stmt(lambda: select(Analysis).where(Analysis.id == db_id)))
     return result.scalar_one_or_none()
 
 
@@ -186,18 +261,38 @@ async def get_user_analyses(
     user_id: str,
     limit: int = 100,
     offset: int = 0,
-    status: Optional[str] = None
-) -> List[Analysis]:
-    """Get analyses for a user, optionally filtered by status"""
-    query = select(Analysis).where(Analysis.user_id == user_id)
+    status: Optional[str] = None,
+    before: Optional[datetime] = None,
+    before_id: Optional[str] = None
+) -> List[Any]:
+    """
+    Get analysis summaries for a user, newest first, optionally filtered by status.
+    
+    Only the list-view columns are selected (rows with attribute access),
+    leaving out the large request/response JSON; use get_analysis_by_id
+    for the full analysis.
+    
+    For deep pagination pass the created_at and id of the previous page's
+    last analysis as before/before_id instead of an offset: the query then
+    starts right there in the index rather than skipping over every earlier
+    row. The id breaks ties, so analyses sharing the boundary created_at
+    aren't skipped.
+    """
+    query = select(*ANALYSIS_SUMMARY_COLUMNS).where(Analysis.user_id == user_id)
     
     if status:
         query = query.where(Analysis.status == status)
+    if before is not None and before_id is not None:
+        query = query.where(tuple_(Analysis.created_at, Analysis.id) < tuple_(before, before_id))
+    elif before is not None:
+        query = query.where(Analysis.created_at < before)
     
-    query = query.order_by(desc(Analysis.created_at)).limit(limit).offset(offset)
+    query = query.order_by(desc(Analysis.created_at), desc(Analysis.id)).limit(limit)
+    if offset:
+        query = query.offset(offset)
     
     result = await db.execute(query)
-    return list(result.scalars().all())
+    return list(result.all())
 
 
 async def delete_analysis(db: AsyncSession, analysis_id: str) -> bool:
@@ -221,8 +316,28 @@ async def create_audit_log(
     details: Optional[Dict[str, Any]] = None,
     ip_address: Optional[str] = None,
     user_agent: Optional[str] = None
-) -> AuditLog:
-    """Create an audit log entry"""
+) -> Optional[AuditLog]:
+    """
+    Create an audit log entry.
+    
+    While the background audit writer runs (started with the API), the
+    entry is only queued and None is returned; otherwise it is written
+    through db and returned.
+    """
+    queued = enqueue_audit_log({
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "action": action,
+        "resource": resource,
+        "details": details or {},
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        # Stamped now, not when the batch is written
+        "created_at": datetime.now(timezone.utc),
+    })
+    if queued:
+        return None
+    
     log = AuditLog(
         user_id=user_id,
         action=action,
@@ -233,7 +348,6 @@ async def create_audit_log(
     )
     db.add(log)
     await db.commit()
-    await db.refresh(log)
     return log
 
 
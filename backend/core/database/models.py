@@ -3,6 +3,7 @@ SQLAlchemy models for Incident RAG database.
 """
 
 from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, Text, ForeignKey, JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -30,6 +31,9 @@ class User(Base):
     analyses = relationship("Analysis", back_populates="user", cascade="all, delete-orphan")
     audit_logs = relationship("AuditLog", back_populates="user")
 
+    # Server defaults (created_at) come back via RETURNING on the INSERT
+    __mapper_args__ = {"eager_defaults": True}
+
     def __repr__(self):
         return f"<User(id={self.id}, email={self.email})>"
 
@@ -43,6 +47,7 @@ class UserSetting(Base):
     key = Column(String, nullable=False, index=True)
     value = Column(Text, nullable=True)  # Store as JSON string or plain text
     value_type = Column(String, nullable=False, default="string")  # string, int, float, bool, path, json
+    value_json = Column(JSONB(none_as_null=True), nullable=True)  # value cast to value_type; NULL on rows written before this column
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
@@ -78,10 +83,24 @@ class Analysis(Base):
 
     # Indexes for common queries
     __table_args__ = (
-        Index("ix_analyses_user_created", "user_id", "created_at"),
+        # id breaks created_at ties for the history keyset cursor. Names
+        # differ from the (user_id, created_at) indexes they replace, since
+        # init_db only creates indexes whose name is missing.
+        Index("ix_analyses_user_created_id", "user_id", "created_at", "id"),
         Index("ix_analyses_status_confidence", "status", "confidence"),
+        # History listing filtered by status, newest first (scanned backwards).
+        # Only fixed-width columns are included: an unbounded one like
+        # root_cause could push an entry past the btree row size limit and
+        # fail the INSERT.
+        Index(
+            "ix_analyses_user_status_created_id", "user_id", "status", "created_at", "id",
+            postgresql_include=["confidence", "processing_time_ms"],
+        ),
     )
 
+    # Server defaults (created_at) come back via RETURNING on the INSERT
+    __mapper_args__ = {"eager_defaults": True}
+
     def __repr__(self):
         return f"<Analysis(id={self.id}, analysis_id={self.analysis_id}, user_id={self.user_id}, status={self.status})>"
 
@@ -107,5 +126,8 @@ class AuditLog(Base):
         Index("ix_audit_logs_user_action", "user_id", "action", "created_at"),
     )
 
+    # Server defaults (created_at) come back via RETURNING on the INSERT
+    __mapper_args__ = {"eager_defaults": True}
+
     def __repr__(self):
         return f"<AuditLog(id={self.id}, user_id={self.user_id}, action={self.action})>"
@@ -15,6 +15,8 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from core.database.models import Base
+from core.jsonutil import json_dumps, json_loads
+from sqlalchemy import text
 from sqlalchemy.engine import URL
 import os
 
@@ -24,8 +26,10 @@ HOST = os.getenv("DB_HOST")
 PORT = int(os.getenv("DB_PORT"))
 DBNAME = os.getenv("DB_NAME")
 
-# Sanity check
-print(USER, PASSWORD, HOST, PORT, DBNAME)
+# Prepared statements cached per connection, by asyncpg and by SQLAlchemy's
+# asyncpg dialect. Set to 0 behind a transaction-mode pooler (e.g. the
+# Supabase pooler on port 6543), which can't keep prepared statements.
+STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "1024"))
 
 
 DATABASE_URL = URL.create(
@@ -35,15 +39,24 @@ DATABASE_URL = URL.create(
     host=HOST,
     port=PORT,
     database=DBNAME,
+    query={"prepared_statement_cache_size": str(STATEMENT_CACHE_SIZE)},
     # query={"sslmode": "require"},
 )
 
+
 # Create async engine
 engine = create_async_engine(
     DATABASE_URL,
-    pool_pre_ping=True,  # Verify connections before using
-    pool_size=5,
-    max_overflow=10,
+    pool_size=20,
+    max_overflow=40,
+    pool_timeout=10,
+    # Replace connections before server/proxy idle timeouts can close them,
+    # instead of pinging on every checkout
+    pool_recycle=1800,
+    pool_pre_ping=False,
+    connect_args={"statement_cache_size": STATEMENT_CACHE_SIZE},
+    json_serializer=json_dumps,  # JSON/JSONB columns use orjson when available
+    json_deserializer=json_loads,
 )
 
 # Create async session factory
@@ -63,16 +76,27 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         @app.get("/items")
         async def get_items(db: AsyncSession = Depends(get_db)):
             ...
+    
+    The session is not committed on the way out: CRUD functions that write
+    commit themselves, so read-only requests skip the extra COMMIT.
     """
     async with AsyncSessionLocal() as session:
         try:
             yield session
-            await session.commit()
         except Exception:
             await session.rollback()
             raise
-        finally:
-            await session.close()
+
+
+# Indexes replaced under a new name; dropped so old databases don't keep both
+_SUPERSEDED_INDEXES = ("ix_analyses_user_created", "ix_analyses_user_status_created")
+
+
+def _create_missing_indexes(sync_conn) -> None:
+    """Create indexes added to models after their tables were created."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
 
 
 async def init_db():
@@ -82,6 +106,20 @@ async def init_db():
     """
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        for name in _SUPERSEDED_INDEXES:
+            await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        # The unique (user_id, key) index can't be built over duplicates left
+        # by the old select-then-insert settings writes; keep the newest row
+        await conn.execute(text(
+            "DELETE FROM user_settings a USING user_settings b "
+            "WHERE a.user_id = b.user_id AND a.key = b.key "
+            "AND (a.updated_at, a.id) < (b.updated_at, b.id)"
+        ))
+        await conn.run_sync(_create_missing_indexes)
+        # create_all doesn't add columns to existing tables
+        await conn.execute(text(
+            "ALTER TABLE user_settings ADD COLUMN IF NOT EXISTS value_json JSONB"
+        ))
     print("✅ Database tables created")
 
 
@@ -3,17 +3,27 @@ Database-backed settings management.
 Handles per-user settings stored in PostgreSQL.
 """
 
+from pathlib import PurePath
 from typing import Dict, Any, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.database.crud import (
     get_user_settings,
-    update_user_setting,
+    upsert_user_settings,
     get_user_setting,
 )
 from core.database.models import UserSetting
 import config
 
 
+# The settings schema is fixed at import; only config values change at
+# runtime (via config.update_settings), so those are still read per request
+_SCHEMA_PLAN = tuple(
+    (s["key"], s.get("default"), bool(s.get("secret")))
+    for s in config.SETTINGS_SCHEMA
+)
+_KEY_TO_META = {s["key"]: s for s in config.SETTINGS_SCHEMA}
+
+
 async def get_user_settings_for_api(
     db: AsyncSession,
     user_id: Optional[str],
@@ -31,21 +41,20 @@ async def get_user_settings_for_api(
     
     # Merge with system defaults from config
     values = {}
-    for s in config.SETTINGS_SCHEMA:
-        k = s["key"]
+    for k, default, secret in _SCHEMA_PLAN:
         # User setting takes precedence, then system config, then default
         if k in db_settings:
             v = db_settings[k]
         else:
             # Get from system config
-            v = getattr(config, k, s.get("default"))
+            v = getattr(config, k, default)
         
         # Convert Path to string
-        if isinstance(v, type(config.VECTOR_DB_PATH)) and hasattr(v, '__str__'):
+        if isinstance(v, PurePath):
             v = str(v)
         
         # Mask secrets unless include_secrets=True
-        if s.get("secret") and v and not include_secrets:
+        if secret and v and not include_secrets:
             v = "********"
         
         values[k] = v
@@ -65,14 +74,12 @@ async def update_user_settings_from_api(
     Update user settings from API request.
     Returns updated settings.
     """
-    key_to_meta = {s["key"]: s for s in config.SETTINGS_SCHEMA}
-    
+    updates = {}
     for k, v in data.items():
-        if k not in key_to_meta:
+        meta = _KEY_TO_META.get(k)
+        if meta is None:
             continue
         
-        meta = key_to_meta[k]
-        
         # Skip if secret and value is masked/empty
         if meta.get("secret") and (v in (None, "", "********")):
             continue
@@ -80,14 +87,10 @@ async def update_user_settings_from_api(
         # Determine value type
         value_type = meta.get("type", "string")
         
-        # Update in DB
-        await update_user_setting(
-            db=db,
-            user_id=user_id,
-            key=k,
-            value=v,
-            value_type=value_type
-        )
+        updates[k] = (v, value_type)
+    
+    # Update in DB, all keys in one upsert
+    await upsert_user_settings(db=db, user_id=user_id, settings=updates)
     
     # Return updated settings
     return await get_user_settings_for_api(db, user_id, include_secrets=False)
@@ -3,22 +3,74 @@ LangGraph state machine for agentic incident analysis.
 Orchestrates multiple agents with proper state management and decision gates.
 """
 
-from typing import TypedDict, List, Dict, Literal, Annotated
-from dataclasses import dataclass
+from typing import AsyncIterator, TypedDict, List, Dict, Literal, Annotated, Optional, Tuple, get_type_hints
+from dataclasses import dataclass, field
 from datetime import datetime
-import operator
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from types import MappingProxyType
+
+# Optional: SQLite checkpointing (pip install langgraph-checkpoint-sqlite)
+try:
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    SQLITE_CHECKPOINT_AVAILABLE = True
+except ImportError:
+    SQLITE_CHECKPOINT_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Shared read-only default for missing dict entries (e.g. no plan yet)
+_EMPTY = MappingProxyType({})
+
+# Gap reported when the request has no dashboard screenshots
+_NO_IMAGES_ERROR = "No dashboard images provided"
+
+# Database file for graph checkpoints; checkpointing is off when unset
+GRAPH_CHECKPOINT_DB = os.getenv("GRAPH_CHECKPOINT_DB")
+
+# Run planner + collectors directly on asyncio instead of through the graph
+# runtime (see run_fast_path); checkpointed runs always use the graph
+GRAPH_FAST_PATH = os.getenv("GRAPH_FAST_PATH", "").lower() in ("1", "true", "yes")
+
+# Collect Grafana dashboards/annotations as evidence (off unless enabled)
+GRAFANA_ENABLED = os.getenv("GRAFANA_ENABLED", "").lower() in ("1", "true", "yes")
+
+# Agents are imported once here rather than on every node call
+sys.path.insert(0, str(Path(__file__).parent))
+
+from agents.planner import plan_incident_analysis
+from agents.image_analyzer import analyze_dashboards
+from agents.log_retriever import retrieve_logs
+from agents.rag_retriever import retrieve_knowledge
+from agents.prometheus_agent import PrometheusAgent
+from agents.grafana_agent import analyze_grafana_incident
+from agents.timeline_correlator import build_timeline
+from agents.hypothesis_generator import generate_hypotheses
+from agents.verifier import EvidenceVerifier
+from agents.decision_gate import make_decision
 
 # State type definitions
-@dataclass
+#
+# Immutable and slotted: the state holds many of these across the evidence
+# lists, and (unlike plain dataclasses) they hash. Mutable fields are left
+# out of the hash.
+@dataclass(slots=True, frozen=True)
 class Evidence:
     """Single piece of evidence from any source"""
     source: str  # "image", "log", "rag"
     content: str
     timestamp: str
     confidence: float
-    metadata: Dict
+    metadata: Dict = field(hash=False)
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TimelineEvent:
     """Single event in the incident timeline"""
     time: str
@@ -26,24 +78,56 @@ class TimelineEvent:
     source: str
     confidence: float
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Hypothesis:
     """A root cause hypothesis"""
     id: str
     root_cause: str
     plausibility: float
-    supporting_evidence: List[str]
-    required_evidence: List[str]
-    would_refute: List[str]
+    supporting_evidence: List[str] = field(hash=False)
+    required_evidence: List[str] = field(hash=False)
+    would_refute: List[str] = field(hash=False)
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class VerificationResult:
     """Result of hypothesis verification"""
     hypothesis_id: str
     verdict: Literal["SUPPORTED", "INSUFFICIENT_EVIDENCE", "CONTRADICTED"]
     confidence: float
-    evidence_summary: Dict
-    contradictions: List[str]
+    evidence_summary: Dict = field(hash=False)
+    contradictions: List[str] = field(hash=False)
+
+def _concat(a: List, b: List) -> List:
+    """
+    List reducer for the accumulating state channels.
+    
+    Like operator.add, but an empty side is passed through rather than
+    copied, so the many empty/no-op writes don't re-copy a long evidence
+    list. Never extends in place: the previous value may still be held by
+    a checkpoint or by the caller's initial state.
+    """
+    if not b:
+        return a
+    if not a:
+        return list(b)
+    return a + b
+
+
+# Most agent_history entries kept; older ones are dropped
+AGENT_HISTORY_LIMIT = 256
+
+
+def _append_bounded(a: List, b: List) -> List:
+    """
+    agent_history reducer: like _concat, keeping only the newest
+    AGENT_HISTORY_LIMIT entries so a long checkpointed thread doesn't
+    re-serialize an ever-growing list.
+    """
+    merged = _concat(a, b)
+    if len(merged) > AGENT_HISTORY_LIMIT:
+        return merged[-AGENT_HISTORY_LIMIT:]
+    return merged
+
 
 # Main state
 class IncidentAnalysisState(TypedDict):
@@ -61,11 +145,11 @@ class IncidentAnalysisState(TypedDict):
     plan: Dict
     
     # Evidence collection (parallel)
-    image_evidence: Annotated[List[Evidence], operator.add]
-    log_evidence: Annotated[List[Evidence], operator.add]
-    rag_evidence: Annotated[List[Evidence], operator.add]
-    metrics_evidence: Annotated[List[Evidence], operator.add]
-    dashboard_evidence: Annotated[List[Evidence], operator.add]
+    image_evidence: Annotated[List[Evidence], _concat]
+    log_evidence: Annotated[List[Evidence], _concat]
+    rag_evidence: Annotated[List[Evidence], _concat]
+    metrics_evidence: Annotated[List[Evidence], _concat]
+    dashboard_evidence: Annotated[List[Evidence], _concat]
     
     # Timeline
     timeline: List[TimelineEvent]
@@ -84,45 +168,59 @@ class IncidentAnalysisState(TypedDict):
     final_response: Dict
     
     # Metadata
-    errors: Annotated[List[str], operator.add]
-    agent_history: Annotated[List[Dict], operator.add]
+    errors: Annotated[List[str], _concat]
+    agent_history: Annotated[List[Dict], _append_bounded]
 
 
 # Agent node functions
+#
+# The evidence collectors are async: the agent libraries are blocking, so
+# each runs its call in a worker thread and the collectors' network I/O
+# overlaps on the event loop. Run the graph with ainvoke/astream.
 def planner_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
     """
     Analyzes user query and creates execution plan.
     """
-    print(f"🟢 [PLANNER AGENT] Starting")
-    from agents.planner import plan_incident_analysis
+    logger.info("[PLANNER AGENT] Starting")
     
     plan = plan_incident_analysis(
         query=state["user_query"],
         timestamp=state["timestamp"]
     )
     
-    return {
+    update = {
         "plan": plan,
         "agent_history": [{"agent": "planner", "timestamp": datetime.now().isoformat()}]
     }
+    
+    # dispatch_collectors doesn't run the image node without images; record
+    # the gap it would have reported
+    if not state.get("dashboard_images"):
+        update["errors"] = [_NO_IMAGES_ERROR]
+        update["agent_history"].append({"agent": "image", "status": "skipped"})
+    
+    return update
 
 
-def image_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
+async def image_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
     """
     Analyzes dashboard screenshots.
     """
-    print(f"🟢 [IMAGE AGENT] Starting")
-    from agents.image_analyzer import analyze_dashboards
+    logger.info("[IMAGE AGENT] Starting")
     
     if not state.get("dashboard_images"):
         return {
-            "errors": ["No dashboard images provided"],
+            "errors": [_NO_IMAGES_ERROR],
             "agent_history": [{"agent": "image", "status": "skipped"}]
         }
     
-    evidence = analyze_dashboards(
+    plan = state.get("plan") or _EMPTY
+    windows = plan.get("search_windows") or _EMPTY
+    
+    evidence = await asyncio.to_thread(
+        analyze_dashboards,
         images=state["dashboard_images"],
-        time_window=state["plan"].get("search_windows", {}).get("metrics")
+        time_window=windows.get("metrics")
     )
     
     return {
@@ -131,18 +229,20 @@ def image_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
     }
 
 
-def log_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
+async def log_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
     """
     Retrieves and analyzes relevant logs.
     """
-    print(f"🟢 [LOG AGENT] Starting")
-
-    from agents.log_retriever import retrieve_logs
+    logger.info("[LOG AGENT] Starting")
     
-    evidence = retrieve_logs(
+    plan = state.get("plan") or _EMPTY
+    windows = plan.get("search_windows") or _EMPTY
+
+    evidence = await asyncio.to_thread(
+        retrieve_logs,
         logs=state["logs"],
-        time_window=state["plan"].get("search_windows", {}).get("logs"),
-        services=state["plan"].get("affected_services", [])
+        time_window=windows.get("logs"),
+        services=plan.get("affected_services", [])
     )
     
     return {
@@ -151,18 +251,19 @@ def log_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
     }
 
 
-def rag_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
+async def rag_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
     """
     Retrieves historical incidents and runbooks.
     """
 
-    print(f"🟢 [RAG AGENT] Starting")
-
-    from agents.rag_retriever import retrieve_knowledge
+    logger.info("[RAG AGENT] Starting")
     
-    evidence = retrieve_knowledge(
-        symptoms=state["plan"].get("symptoms", []),
-        services=state["plan"].get("affected_services", [])
+    plan = state.get("plan") or _EMPTY
+
+    evidence = await asyncio.to_thread(
+        retrieve_knowledge,
+        symptoms=plan.get("symptoms", []),
+        services=plan.get("affected_services", [])
     )
     
     return {
@@ -171,20 +272,29 @@ def rag_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
     }
 
 
+# PrometheusAgent per (url, debug), reused so its pooled HTTP session and
+# job discovery cache survive across analyses
+_prometheus_agents: Dict[tuple, PrometheusAgent] = {}
+
+
+def _get_prometheus_agent(url: str, debug: bool) -> PrometheusAgent:
+    agent = _prometheus_agents.get((url, debug))
+    if agent is None:
+        agent = _prometheus_agents[(url, debug)] = PrometheusAgent(url=url, debug=debug)
+    return agent
+
+
 # Update your prometheus_agent function in graph.py
-def prometheus_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
+async def prometheus_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
     """
     Collects system and application metrics from Prometheus.
     """
-    print(f"🟢 [PROMETHEUS AGENT] Starting")
-    
-    from agents.prometheus_agent import PrometheusAgent
-
+    logger.info("[PROMETHEUS AGENT] Starting")
     
     try:
-        plan = state.get("plan", {})
-        prometheus_config = plan.get("prometheus_config", {})
-        print(f"🔵 [PROMETHEUS AGENT] Config: {prometheus_config}")
+        plan = state.get("plan") or _EMPTY
+        prometheus_config = plan.get("prometheus_config") or _EMPTY
+        logger.debug("[PROMETHEUS AGENT] Config: %s", prometheus_config)
         
         # Get configuration from plan
         window_minutes = prometheus_config.get("window_minutes", 35)
@@ -192,25 +302,19 @@ def prometheus_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
         metrics_to_collect = prometheus_config.get("metrics_to_collect", [])
         prometheus_url = plan.get("prometheus_url", "http://localhost:9090")
         debug_mode = plan.get("debug_mode", True)
-        agent = PrometheusAgent(url=prometheus_url, debug=debug_mode)
+        agent = _get_prometheus_agent(prometheus_url, debug_mode)
         
         # If no specific services from plan, use affected_services
         if not target_services:
             target_services = plan.get("affected_services", [])
         
-        print(f"🔵 [PROMETHEUS AGENT] Starting collection:")
-        print(f"   - Window: {window_minutes} minutes")
-        print(f"   - Services: {target_services}")
-        print(f"   - Metrics to collect: {metrics_to_collect}")
-        
-        # DEBUG: Check what parameters collect_incident_metrics accepts
-        import inspect
-        sig = inspect.signature(agent.collect_incident_metrics)
-        print(f"🔵 [PROMETHEUS AGENT] Function signature: {sig}")
+        logger.debug(
+            "[PROMETHEUS AGENT] Starting collection: window=%s minutes, services=%s, metrics=%s",
+            window_minutes, target_services, metrics_to_collect
+        )
         
-        # Call the function with correct parameters
-        # Based on your earlier code, it might need 'jobs' instead of 'affected_services'
-        evidence = agent.collect_incident_metrics(
+        evidence = await asyncio.to_thread(
+            agent.collect_incident_metrics,
             incident_time=state["timestamp"],
             window_minutes=window_minutes,
             jobs=target_services,
@@ -220,7 +324,7 @@ def prometheus_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
             # debug=debug_mode
         )
         
-        print(f"🔵 [PROMETHEUS AGENT] Collection complete. Got {len(evidence)} evidence items")
+        logger.info("[PROMETHEUS AGENT] Collection complete. Got %d evidence items", len(evidence))
         
         return {
             "metrics_evidence": evidence,
@@ -237,9 +341,7 @@ def prometheus_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
         }
     except Exception as e:
         error_msg = f"Prometheus agent error: {str(e)}"
-        print(f"🔴 [PROMETHEUS AGENT ERROR] {error_msg}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[PROMETHEUS AGENT ERROR] %s", error_msg)
         
         return {
             "metrics_evidence": [],
@@ -251,18 +353,17 @@ def prometheus_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
                 "error": str(e)
             }]
         }
-def grafana_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
+async def grafana_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
     """
     Retrieves dashboards and annotations from Grafana.
     """
-    print(f"🟢 [GRAFANA AGENT] Starting")
-
-    from agents.grafana_agent import analyze_grafana_incident
+    logger.info("[GRAFANA AGENT] Starting")
     
-    evidence = analyze_grafana_incident(
+    evidence = await asyncio.to_thread(
+        analyze_grafana_incident,
         incident_time=state["timestamp"],
         window_minutes=30,
-        dashboard_tags=state["plan"].get("affected_services", [])
+        dashboard_tags=(state.get("plan") or _EMPTY).get("affected_services", [])
     )
     
     return {
@@ -275,16 +376,19 @@ def timeline_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
     """
     Correlates all evidence into a timeline.
     """
-    from agents.timeline_correlator import build_timeline
-    
-    all_evidence = (
-        state.get("image_evidence", []) +
-        state.get("log_evidence", []) +
-        state.get("rag_evidence", []) +
-        state.get("metrics_evidence", []) +
-        state.get("dashboard_evidence", [])+
-        state.get("rag_evidence", [])
-    )
+    # Order-preserving dedup: the same item can arrive through more than one
+    # stream (e.g. a dashboard seen via several annotations). Keyed on the
+    # identifying fields, since the agents' own Evidence types don't hash.
+    unique = {}
+    for item in itertools.chain(
+        state.get("image_evidence", ()),
+        state.get("log_evidence", ()),
+        state.get("rag_evidence", ()),
+        state.get("metrics_evidence", ()),
+        state.get("dashboard_evidence", ())
+    ):
+        unique.setdefault((item.source, item.content, item.timestamp), item)
+    all_evidence = list(unique.values())
     
     timeline, correlations, gaps = build_timeline(all_evidence)
     
@@ -300,8 +404,6 @@ def hypothesis_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
     """
     Generates root cause hypotheses.
     """
-    from agents.hypothesis_generator import generate_hypotheses
-    
     hypotheses = generate_hypotheses(
         timeline=state["timeline"],
         correlations=state["correlations"],
@@ -318,15 +420,14 @@ def hypothesis_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
     }
 
 
-def verifier_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
+async def verifier_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
     """
     Verifies each hypothesis against evidence.
     CRITICAL: This is the quality gate.
     """
-    from agents.verifier import EvidenceVerifier
-
-    verifier=EvidenceVerifier()
-    verification_results, overall_confidence = verifier.verify_hypotheses(
+    # Re-analysing the same incident reuses results for unchanged hypotheses
+    verifier = EvidenceVerifier(cache_results=True)
+    verification_results, overall_confidence = await verifier.verify_hypotheses_async(
         hypotheses=state["hypotheses"],
         evidence={
             "image": state.get("image_evidence", []),
@@ -349,8 +450,6 @@ def decision_gate_agent(state: IncidentAnalysisState) -> IncidentAnalysisState:
     """
     Makes final decision: answer, refuse, or request more data.
     """
-    from agents.decision_gate import make_decision
-    
     decision, final_response = make_decision(
         verification_results=state["verification_results"],
         overall_confidence=state["overall_confidence"],
@@ -394,12 +493,47 @@ def route_after_verification(state: IncidentAnalysisState) -> str:
 
 
 # Build the graph
+from langgraph.constants import Send
 from langgraph.graph import StateGraph, END
 
-def build_incident_analysis_graph():
+
+def dispatch_collectors(state: IncidentAnalysisState) -> List[Send]:
+    """
+    Fan out from the planner to the evidence collectors.
+    
+    Each collector gets only the state keys it reads rather than a copy of
+    the whole state. Collectors whose inputs are empty, and so could only
+    return nothing, aren't run. Prometheus always runs: with no target
+    services it discovers the jobs itself. Grafana runs only when
+    GRAFANA_ENABLED is set.
+    """
+    plan = state.get("plan", {})
+    sends = []
+    
+    dashboard_images = state.get("dashboard_images")
+    if dashboard_images:
+        sends.append(Send("image", {"plan": plan, "dashboard_images": dashboard_images}))
+    
+    logs = state.get("logs")
+    if logs:
+        sends.append(Send("log", {"plan": plan, "logs": logs}))
+    
+    if plan.get("symptoms") or plan.get("affected_services"):
+        sends.append(Send("rag", {"plan": plan}))
+    
+    sends.append(Send("prometheus", {"plan": plan, "timestamp": state["timestamp"]}))
+    
+    if GRAFANA_ENABLED:
+        sends.append(Send("grafana", {"plan": plan, "timestamp": state["timestamp"]}))
+    return sends
+
+def build_incident_analysis_graph(checkpointer=None):
     """
     Constructs the full LangGraph workflow.
     
+    With a checkpointer (see get_checkpointer) the state is saved after
+    every node; run it with run_analysis.
+    
     Flow:
     1. Planner analyzes query
     2. Parallel evidence collection (image, log, rag, metrics, dashboard)
@@ -427,11 +561,11 @@ def build_incident_analysis_graph():
     workflow.set_entry_point("planner")
     
     # After planner → parallel evidence collection
-    workflow.add_edge("planner", "image")
-    workflow.add_edge("planner", "log")
-    workflow.add_edge("planner", "rag")
-    workflow.add_edge("planner", "prometheus")
-    # workflow.add_edge("planner", "grafana")
+    workflow.add_conditional_edges(
+        "planner",
+        dispatch_collectors,
+        ["image", "log", "rag", "prometheus", "grafana"]
+    )
     
     # All evidence collectors → timeline
     workflow.add_edge("image", "timeline")
@@ -446,9 +580,180 @@ def build_incident_analysis_graph():
     workflow.add_edge("verifier", "decision_gate")
     workflow.add_edge("decision_gate", END)
     
+    return workflow.compile(checkpointer=checkpointer)
+
+
+_checkpointer = None
+
+
+def get_checkpointer():
+    """
+    Shared SQLite checkpointer, or None when GRAPH_CHECKPOINT_DB is unset or
+    langgraph-checkpoint-sqlite isn't installed.
+    """
+    global _checkpointer
+    if _checkpointer is None and GRAPH_CHECKPOINT_DB and SQLITE_CHECKPOINT_AVAILABLE:
+        # The connection is opened on first use
+        _checkpointer = AsyncSqliteSaver(aiosqlite.connect(GRAPH_CHECKPOINT_DB))
+    return _checkpointer
+
+
+def analysis_thread_id(state: Dict, user_id: Optional[str] = None) -> str:
+    """
+    Checkpoint thread for an analysis input. A stable digest rather than
+    hash(), which is salted per process, so a retry in another worker finds
+    the same checkpoints. The user is part of the key so identical inputs
+    from different users never share a thread.
+    """
+    key = json.dumps(
+        [user_id, state["user_query"], state["timestamp"],
+         state.get("dashboard_images", []), state.get("logs", [])],
+        default=str
+    )
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+async def _delete_thread(checkpointer, thread_id: str) -> None:
+    """Drop a thread's checkpoints (no-op on savers without adelete_thread)."""
+    delete = getattr(checkpointer, "adelete_thread", None)
+    if delete is None:
+        return
+    try:
+        await delete(thread_id)
+    except Exception as e:
+        logger.warning("Could not delete checkpoint thread %s: %s", thread_id, e)
+
+
+async def stream_analysis(
+    graph,
+    initial_state: Dict,
+    thread_id: Optional[str] = None,
+    user_id: Optional[str] = None
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Run the graph, yielding (node, update) as each node finishes and finally
+    (END, final_state).
+    
+    Callers can show each collector's evidence as it lands instead of
+    waiting for the slowest one. If the graph has a checkpointer, an
+    interrupted run on the same input resumes after its last completed node
+    instead of starting over. Checkpoints only serve that purpose: a thread
+    is deleted once its run completes, so a repeated request collects fresh
+    evidence and the checkpoint DB only holds unfinished runs.
+    """
+    config = None
+    graph_input = initial_state
+    if graph.checkpointer is not None:
+        thread_id = thread_id or analysis_thread_id(initial_state, user_id)
+        config = {"configurable": {"thread_id": thread_id}}
+        snapshot = await graph.aget_state(config)
+        if snapshot.values:
+            if snapshot.next:
+                graph_input = None
+            else:
+                # Finished but not pruned (e.g. the worker died right after)
+                await _delete_thread(graph.checkpointer, thread_id)
+    
+    final_state: Dict = {}
+    async for mode, chunk in graph.astream(graph_input, config, stream_mode=["updates", "values"]):
+        if mode == "updates":
+            for node, update in chunk.items():
+                yield node, update or {}
+        else:
+            final_state = chunk
+    
+    # Before the final yield: callers usually stop iterating at END
+    if config is not None:
+        await _delete_thread(graph.checkpointer, thread_id)
+    yield END, final_state
+
+
+async def run_analysis(
+    graph,
+    initial_state: Dict,
+    thread_id: Optional[str] = None,
+    user_id: Optional[str] = None
+) -> Dict:
+    """Run the graph to completion and return the final state (see stream_analysis)."""
+    async for node, update in stream_analysis(graph, initial_state, thread_id, user_id):
+        if node == END:
+            return update
+
+
+# Fast path
+#
+# The planner -> collectors stage is static, so it can run as plain asyncio
+# tasks without the graph runtime's per-node overhead. Only the stage after
+# it goes through LangGraph.
+_COLLECTOR_NODES = {
+    "image": image_agent,
+    "log": log_agent,
+    "rag": rag_agent,
+    "prometheus": prometheus_agent,
+    "grafana": grafana_agent,
+}
+
+# State key -> reducer, for merging node updates the way the graph would
+_REDUCERS = {
+    key: hint.__metadata__[0]
+    for key, hint in get_type_hints(IncidentAnalysisState, include_extras=True).items()
+    if hasattr(hint, "__metadata__")
+}
+
+_analysis_tail_graph = None
+
+
+def _merge_update(state: Dict, update: Dict) -> None:
+    """Apply a node's update to state, using the channel reducers."""
+    for key, value in update.items():
+        reducer = _REDUCERS.get(key)
+        state[key] = reducer(state.get(key) or [], value) if reducer else value
+
+
+def build_analysis_tail_graph():
+    """The graph from timeline onwards, for run_fast_path."""
+    workflow = StateGraph(IncidentAnalysisState)
+    
+    workflow.add_node("timeline", timeline_agent)
+    workflow.add_node("hypothesis", hypothesis_agent)
+    workflow.add_node("verifier", verifier_agent)
+    workflow.add_node("decision_gate", decision_gate_agent)
+    
+    workflow.set_entry_point("timeline")
+    workflow.add_edge("timeline", "hypothesis")
+    workflow.add_edge("hypothesis", "verifier")
+    workflow.add_edge("verifier", "decision_gate")
+    workflow.add_edge("decision_gate", END)
+    
     return workflow.compile()
 
 
+async def run_fast_path(initial_state: Dict) -> Dict:
+    """
+    Same result as run_analysis on the full graph, without checkpointing.
+    
+    Runs the planner, then the collectors chosen by dispatch_collectors
+    concurrently in a TaskGroup, and hands the merged state to the graph
+    at the timeline stage.
+    """
+    global _analysis_tail_graph
+    
+    state = dict(initial_state)
+    _merge_update(state, await asyncio.to_thread(planner_agent, state))
+    
+    async with asyncio.TaskGroup() as tg:
+        tasks = [
+            tg.create_task(_COLLECTOR_NODES[send.node](send.arg))
+            for send in dispatch_collectors(state)
+        ]
+    for task in tasks:
+        _merge_update(state, task.result())
+    
+    if _analysis_tail_graph is None:
+        _analysis_tail_graph = build_analysis_tail_graph()
+    return await _analysis_tail_graph.ainvoke(state)
+
+
 # Usage example
 if __name__ == "__main__":
     graph = build_incident_analysis_graph()
@@ -468,8 +773,14 @@ if __name__ == "__main__":
         "agent_history": []
     }
     
-    # Run the graph
-    result = graph.invoke(initial_state)
+    # Run the graph, reporting each node as it finishes
+    async def run():
+        async for node, update in stream_analysis(graph, initial_state):
+            if node == END:
+                return update
+            print(f"✓ {node}")
+    
+    result = asyncio.run(run())
     
     print(f"Decision: {result['decision']}")
     print(f"Confidence: {result['overall_confidence']}")
@@ -0,0 +1,24 @@
+"""
+Shared JSON encoding/decoding.
+
+Uses orjson when installed (several times faster than stdlib json for the
+large payloads here: Prometheus range queries, analysis JSON columns, tool
+results), falling back to json with matching behaviour: compact output,
+non-string dict keys allowed, and unknown types encoded with str().
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+
+    def json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS, default=str).decode()
+
+    json_loads = orjson.loads
+except ImportError:
+    def json_dumps(obj: Any) -> str:
+        return json.dumps(obj, separators=(",", ":"), default=str)
+
+    json_loads = json.loads
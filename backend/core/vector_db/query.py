@@ -6,6 +6,11 @@ Provides functions for searching Pinecone indexes:
 - search_logs(): Search application logs
 - search_incidents(): Search historical incidents  
 - search_runbooks(): Search documentation
+- embed_query(): Embed a query for callers that cache by embedding
+
+Nearest-neighbour search runs inside Pinecone, so there is no local index to
+load, quantize or move to a GPU; scaling to large corpora is a matter of the
+Pinecone index configuration rather than of this client.
 
 Usage:
     from vector_db.query import search_logs, search_incidents
@@ -163,15 +168,32 @@ class VectorSearcher:
         Returns:
             List of incident records with similarity scores
         """
+        if self._get_incident_index() is None:
+            return []
+        
+        return self.search_incidents_by_vector(
+            self._embed_query(query), top_k, min_similarity, service_filter
+        )
+    
+    def search_incidents_by_vector(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        min_similarity: float = 0.6,
+        service_filter: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """
+        Search historical incidents with a precomputed query embedding.
+        
+        Lets callers that search several indexes embed the query only once.
+        See search_incidents for the arguments and return value.
+        """
         # Load index
         index = self._get_incident_index()
         
         if index is None:
             return []
         
-        # Create query embedding
-        query_vector = self._embed_query(query)
-        
         # Search Pinecone
         try:
             results = index.query(
@@ -225,15 +247,28 @@ class VectorSearcher:
         Returns:
             List of runbook sections with similarity scores
         """
+        if self._get_runbook_index() is None:
+            return []
+        
+        return self.search_runbooks_by_vector(self._embed_query(query), top_k, min_similarity)
+    
+    def search_runbooks_by_vector(
+        self,
+        query_vector: List[float],
+        top_k: int = 3,
+        min_similarity: float = 0.5
+    ) -> List[Dict]:
+        """
+        Search runbooks with a precomputed query embedding.
+        
+        See search_runbooks for the arguments and return value.
+        """
         # Load index
         index = self._get_runbook_index()
         
         if index is None:
             return []
         
-        # Create query embedding
-        query_vector = self._embed_query(query)
-        
         # Search Pinecone
         try:
             results = index.query(
@@ -263,6 +298,17 @@ class VectorSearcher:
         
         return formatted_results
     
+    def warm_up(self) -> None:
+        """
+        Resolve the incident and runbook index handles ahead of the first query.
+        
+        Pinecone serves these indexes from its own ANN structure, so the only
+        per-process cost left on the query path is resolving each index host.
+        Doing it here lets long-lived callers pay that once at startup.
+        """
+        self._get_incident_index()
+        self._get_runbook_index()
+    
     def _get_log_index(self):
         """Get log index (cached)"""
         if self._log_index is None:
@@ -323,6 +369,11 @@ def search_logs(
     return get_searcher().search_logs(query, top_k, time_window, service_filter, level_filter)
 
 
+def embed_query(query: str) -> List[float]:
+    """Embed a search query. See VectorSearcher._embed_query for details."""
+    return get_searcher()._embed_query(query)
+
+
 def search_incidents(
     query: str,
     top_k: int = 5,
@@ -342,6 +393,25 @@ def search_runbooks(
     return get_searcher().search_runbooks(query, top_k, min_similarity)
 
 
+def search_incidents_by_vector(
+    query_vector: List[float],
+    top_k: int = 5,
+    min_similarity: float = 0.6,
+    service_filter: Optional[List[str]] = None
+) -> List[Dict]:
+    """Search historical incidents by embedding. See VectorSearcher.search_incidents_by_vector."""
+    return get_searcher().search_incidents_by_vector(query_vector, top_k, min_similarity, service_filter)
+
+
+def search_runbooks_by_vector(
+    query_vector: List[float],
+    top_k: int = 3,
+    min_similarity: float = 0.5
+) -> List[Dict]:
+    """Search runbooks by embedding. See VectorSearcher.search_runbooks_by_vector."""
+    return get_searcher().search_runbooks_by_vector(query_vector, top_k, min_similarity)
+
+
 # CLI for testing
 def main():
     """Test the vector search functionality"""
@@ -5,6 +5,8 @@ This shows how to enable Claude-powered metrics querying for your agents.
 The agents will automatically query Prometheus/Grafana when they need evidence.
 """
 
+import asyncio
+
 from core.graph import build_incident_analysis_graph
 from core.agents.hypothesis_generator import HypothesisGenerator
 from core.agents.verifier import Verifier
@@ -41,7 +43,7 @@ def analyze_incident_with_intelligent_metrics(
         "agent_history": []
     }
     
-    result = graph.invoke(initial_state)
+    result = asyncio.run(graph.ainvoke(initial_state))
     
     return {
         "decision": result["decision"],
@@ -0,0 +1,42 @@
+"""
+Unit tests for password hashing.
+
+Run with: pytest tests/test_auth.py -v
+"""
+
+import pytest
+from pathlib import Path
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.auth import get_password_hash, verify_password
+
+
+# Multibyte passwords whose UTF-8 encoding runs past bcrypt's 72-byte limit
+LONG_PASSWORDS = [
+    "a" * 100,
+    "é" * 50,          # 2 bytes per character
+    "密码" * 20,        # 3 bytes per character
+    "🔒" * 30,          # 4 bytes per character
+    "x" * 71 + "€",    # multibyte character straddling byte 72
+]
+
+
+@pytest.mark.parametrize("password", LONG_PASSWORDS)
+def test_long_password_round_trip(password):
+    """Passwords longer than 72 bytes hash and verify in full"""
+    assert len(password.encode("utf-8")) > 72
+    
+    hashed = get_password_hash(password)
+    
+    assert verify_password(password, hashed)
+
+
+@pytest.mark.parametrize("password", LONG_PASSWORDS)
+def test_long_password_not_truncated(password):
+    """Passwords differing only after the first 72 bytes don't collide"""
+    hashed = get_password_hash(password)
+    
+    assert not verify_password(password + "!", hashed)
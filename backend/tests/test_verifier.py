@@ -0,0 +1,88 @@
+"""
+Unit tests for the verifier's causal-ordering check.
+
+Run with: pytest tests/test_verifier.py -v
+"""
+
+import pytest
+from pathlib import Path
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.agents.verifier import EvidenceVerifier, Hypothesis, _causal_claim
+
+
+def make_hypothesis(root_cause):
+    return Hypothesis(
+        id="H1",
+        root_cause=root_cause,
+        plausibility=0.5,
+        supporting_evidence=[],
+        required_evidence=[],
+        would_refute=[]
+    )
+
+
+def check(root_cause, timeline):
+    return EvidenceVerifier()._check_timeline_consistency(
+        make_hypothesis(root_cause), timeline, {}
+    )
+
+
+DEPLOY_THEN_OOM = [
+    {"time": "2024-01-15T14:30:00Z", "event": "Deployment v2.3 rolled out"},
+    {"time": "2024-01-15T14:32:00Z", "event": "OutOfMemoryError in api-gateway"},
+]
+
+OOM_THEN_DEPLOY = [
+    {"time": "2024-01-15T14:30:00Z", "event": "OutOfMemoryError in api-gateway"},
+    {"time": "2024-01-15T14:32:00Z", "event": "Deployment v2.3 rolled out"},
+]
+
+
+@pytest.mark.parametrize("root_cause", [
+    "OutOfMemoryError caused by deployment",
+    "Deployment caused OutOfMemoryError",
+    "OutOfMemoryError due to the deployment",
+])
+def test_cause_before_effect_is_consistent(root_cause):
+    """A claim whose cause precedes its effect in the timeline holds"""
+    assert check(root_cause, DEPLOY_THEN_OOM) is True
+
+
+@pytest.mark.parametrize("root_cause", [
+    "OutOfMemoryError caused by deployment",
+    "Deployment caused OutOfMemoryError",
+])
+def test_effect_before_cause_is_inconsistent(root_cause):
+    """A claim whose cause comes after its effect is rejected"""
+    assert check(root_cause, OOM_THEN_DEPLOY) is False
+
+
+@pytest.mark.parametrize("root_cause", [
+    "Errors from the payment service after a deployment",
+    "Memory pressure following the traffic spike",
+    "Connection pool exhaustion",
+])
+def test_non_causal_phrasing_makes_no_claim(root_cause):
+    """Bare "from"/"after"/"following" are not read as causal connectors"""
+    assert _causal_claim(root_cause.lower()) is None
+
+
+def test_claim_terms_exclude_temporal_words():
+    """Temporal words inside a claim don't become cause or effect terms"""
+    cause, effect = _causal_claim("errors after restart caused by deployment")
+    assert cause == {"deployment"}
+    assert effect == {"errors", "restart"}
+
+
+def test_non_causal_hypothesis_falls_back_to_event_count():
+    """Without a causal claim, order doesn't matter; two events suffice"""
+    timeline = [
+        {"time": "2024-01-15T14:30:00Z", "event": "payment service errors"},
+        {"time": "2024-01-15T14:32:00Z", "event": "deployment finished"},
+    ]
+    assert check("Errors from the payment service after a deployment", timeline) is True
+    assert check("Errors from the payment service after a deployment", timeline[:1]) is False